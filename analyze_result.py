@@ -6,19 +6,43 @@
 # Description: NTRCA Result Analysis Tool - Analyzes candidate results and subject statistics
 # 
 # Features:
-# - Search candidates by roll number (-r/--roll)
+# - Search candidates by roll number (-r/--roll), via the roll index when the
+#   result store is present
 # - Analyze subject performance by code (-s/--subject_code)
 # - Show top failing subjects (-f/--fail_rate)
 # - Display all subject statistics (-a/--all)
 # - Interactive subject analysis after candidate search
+# - Columnar (NumPy) statistics backend, cached in all_results.npz (--backend)
+# - Streaming single-pass backend with flat memory use (--backend stream)
+# - Reads the scrapers' materialized subject_stats.json when it is up to date,
+#   including while a scrape is still running (--backend aggregate)
+# - Long-running JSON query service with hot reload (--serve, see result_service.py)
+# - Cross-exam comparison by subject code, position and repeat candidates
+#   (--compare, needs NumPy)
 # 
 # Usage: python script.py [-r ROLL] [-s CODE] [-f] [-a]
+#        python script.py --serve [--port 8080 | --socket PATH]
+#        python script.py --compare 17th=results/17th/all_results.json 18th=all_results.json [--output FILE]
+#        python script.py --compare --manifest exams.json
 # ------------------------------------------------------------------------------
 
 import argparse
 import json
+import math
+import os
+import sys
 from collections import defaultdict
 
+from exams import load_manifest
+from result_service import serve
+from result_store import RESULTS_STORE, RESULTS_JSON, lookup_roll, iter_results_file
+from subject_stats import SubjectStats, load_fresh_stats
+
+try:
+    from result_columns import load_columns, process_columns, compare_columns
+except ImportError:
+    load_columns = process_columns = compare_columns = None
+
 def load_data():
     with open("all_results.json", "r", encoding="utf-8") as f:
         return json.load(f)
@@ -27,6 +51,7 @@ def process_data(data, analyze_subjects=True):
     if not analyze_subjects:
         return {
             "data": data,
+            "total_candidates": len(data),
             "subject_code_map": {},
             "passed_counts": defaultdict(lambda: defaultdict(int)),
             "failed_counts": defaultdict(int),
@@ -81,6 +106,7 @@ def process_data(data, analyze_subjects=True):
 
     return {
         "data": data,
+        "total_candidates": len(data),
         "subject_code_map": subject_code_map,
         "passed_counts": passed_counts,
         "failed_counts": failed_counts,
@@ -110,6 +136,14 @@ def print_subject_stats(code, stats):
 
 def search_candidate_by_roll(data, roll_number):
     results = [c for c in data if c.get("roll", "") == roll_number]
+    return print_candidates(roll_number, results)
+
+def search_candidate_by_index(roll_number):
+    """Binary-search the roll index instead of loading the whole dataset"""
+    candidate = lookup_roll(roll_number)
+    return print_candidates(roll_number, [candidate] if candidate else [])
+
+def print_candidates(roll_number, results):
     if not results:
         print(f"No candidate found with roll number: {roll_number}")
         return False
@@ -128,26 +162,154 @@ def search_candidate_by_roll(data, roll_number):
         print("-"*50)
     return True
 
+def load_exam_columns(sources):
+    """[(name, columns)] for "NAME=FILE" or "FILE" sources, each cached next to its file"""
+    exams = []
+    for source in sources:
+        name, sep, path = source.partition("=")
+        if not sep:
+            path = source
+            # results/17th/all_results.json -> 17th
+            name = os.path.basename(os.path.dirname(os.path.abspath(path))) or path
+        columns_file = os.path.splitext(path)[0] + ".npz"
+        exams.append((name, load_columns(path, columns_file)))
+    return exams
+
+def format_rate(count, rate):
+    return f"{count} ({rate:.2f}%)"
+
+def compare_report(comparison, top=10):
+    """Lines of the cross-exam report, in the layout of ntrca_stats.txt"""
+    names = comparison["names"]
+    codes = comparison["codes"]
+    lines = [f"Comparison: {' -> '.join(names)}", "=" * 70]
+    for name, (total, passed, failed) in zip(names, comparison["overall"]):
+        lines.append(f"{name}: Total Candidates: {total}, Passed = {passed}, Failed = {failed}")
+    lines.append("=" * 70)
+
+    lines.append("\nPass and fail rates by subject code:")
+    for c, code in enumerate(codes):
+        subject = comparison["subject_names"].get(code, "UNKNOWN SUBJECT")
+        lines.append(f"Subject: {subject} ({code})")
+        for e, name in enumerate(names):
+            total = comparison["total"][e, c]
+            if not total:
+                lines.append(f"         {name}: no candidates")
+                continue
+            line = (
+                f"         {name}: Total candidates: {total}"
+                f" | Passed: {format_rate(comparison['passed'][e, c], comparison['pass_rate'][e, c])}"
+                f" | Failed: {format_rate(comparison['failed'][e, c], comparison['fail_rate'][e, c])}"
+            )
+            if e > 0 and comparison["total"][e - 1, c]:
+                line += f" | Change: {comparison['fail_change'][e - 1, c]:+.2f} pts"
+            lines.append(line)
+        lines.append("-" * 70)
+
+    for e in range(1, len(names)):
+        change = comparison["fail_change"][e - 1]
+        # NaN (no candidates in one of the exams) must go before sorting: it compares false with everything
+        ranked = sorted((c for c in range(len(codes)) if not math.isnan(change[c])), key=lambda c: abs(change[c]), reverse=True)
+        lines.append(f"\nTop {top} fail rate changes, {names[e - 1]} -> {names[e]}:")
+        for c in ranked[:top]:
+            subject = comparison["subject_names"].get(codes[c], "UNKNOWN SUBJECT")
+            lines.append(
+                f" - {subject} ({codes[c]}) - {comparison['fail_rate'][e - 1, c]:.2f}% -> "
+                f"{comparison['fail_rate'][e, c]:.2f}% ({change[c]:+.2f} pts)"
+            )
+
+    lines.append("\nPassed candidates by position:")
+    position_totals = comparison["position_counts"].sum(axis=1)
+    for p in comparison["position_counts"].sum(axis=0).argsort(kind="stable")[::-1]:
+        counts = comparison["position_counts"][:, p]
+        if not counts.any():
+            continue
+        shares = " | ".join(
+            f"{name} {format_rate(counts[e], counts[e] * 100 / position_totals[e] if position_totals[e] else 0)}"
+            for e, name in enumerate(names)
+        )
+        lines.append(f"         {comparison['positions'][p]}: {shares}")
+    lines.append("-" * 70)
+
+    lines.append("\nCandidates in several rounds (matched by name and parents of passed candidates):")
+    lines.append("         Identified: " + " | ".join(f"{name} {count}" for name, count in zip(names, comparison["identified"])))
+    for rounds in range(2, len(names) + 1):
+        lines.append(f"         In {rounds} rounds: {comparison['appearances'][rounds]}")
+    for i in range(len(names)):
+        for j in range(i + 1, len(names)):
+            lines.append(f"         {names[i]} & {names[j]}: {comparison['overlap'][i, j]}")
+    lines.append("=" * 70)
+    return lines
+
 def main():
     parser = argparse.ArgumentParser(description="Analyze subject results or search candidate records.")
     parser.add_argument("-s", "--subject_code", help="Subject code to filter the analysis")
     parser.add_argument("-f", "--fail_rate", action="store_true", help="Show top 10 subjects sorted by fail percentage")
     parser.add_argument("-a", "--all", action="store_true", help="Show statistics for all subject codes")
     parser.add_argument("-r", "--roll", help="Search for candidate by roll number")
+    parser.add_argument("--backend", choices=["auto", "aggregate", "columnar", "json", "stream"], default="auto", help="Statistics backend; auto uses the saved aggregate when it is up to date, then columnar when NumPy is installed; stream reads one record at a time")
+    parser.add_argument("--compare", nargs="*", metavar="[NAME=]FILE", help="Compare several exams' results files, oldest first")
+    parser.add_argument("--manifest", help="With --compare: add every exam of this manifest (see get_result_multi.py)")
+    parser.add_argument("--output", help="With --compare: also write the report to this file")
+    parser.add_argument("--serve", action="store_true", help="Keep the results in memory and answer queries over HTTP until interrupted")
+    parser.add_argument("--host", default="127.0.0.1", help="Address for --serve (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="Port for --serve (default: 8080)")
+    parser.add_argument("--socket", help="Serve on this Unix socket instead of a TCP port")
+    parser.add_argument("--results", default="all_results.json", help="Results file --serve loads, JSON array or JSON lines store (default: all_results.json)")
+    parser.add_argument("--reload-interval", type=float, default=1.0, help="Seconds between checks of the results file for changes in --serve (default: 1)")
     args = parser.parse_args()
 
-    data = load_data()
-    
-    stats = process_data(data, analyze_subjects=True)
+    if args.serve:
+        serve(args.results, args.host, args.port, args.socket, args.reload_interval)
+        return
+
+    if args.compare is not None:
+        if compare_columns is None:
+            parser.error("--compare needs NumPy (pip install numpy)")
+        sources = list(args.compare)
+        if args.manifest:
+            sources += [f"{exam.name}={exam.path(RESULTS_JSON)}" for exam in load_manifest(args.manifest)]
+        if not sources:
+            parser.error("--compare needs results files or --manifest")
+        report = "\n".join(compare_report(compare_columns(load_exam_columns(sources))))
+        print(report)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(report + "\n")
+            print(f"💾 Saved the comparison to {args.output}")
+        return
+
+    if args.backend == "columnar" and process_columns is None:
+        parser.error("the columnar backend needs NumPy (pip install numpy)")
+    columnar = args.backend == "columnar" or (args.backend in ("auto", "aggregate") and process_columns is not None)
+
+    def compute_stats():
+        if args.backend in ("auto", "aggregate"):
+            stats = load_fresh_stats("all_results.json")
+            if stats is not None:
+                return stats
+            if args.backend == "aggregate":
+                print("ℹ️ subject_stats.json is missing or stale, recomputing")
+        if args.backend == "stream":
+            return SubjectStats().update(iter_results_file("all_results.json")).finalize()
+        if columnar:
+            return process_columns(load_columns())
+        return process_data(load_data(), analyze_subjects=True)
 
+    stats = None
     if args.roll:
-        found = search_candidate_by_roll(data, args.roll)
+        if os.path.exists(RESULTS_STORE):
+            found = search_candidate_by_index(args.roll)
+        else:
+            found = search_candidate_by_roll(iter_results_file("all_results.json"), args.roll)
         if not found:
             return
 
-        if not any([args.subject_code, args.fail_rate, args.all]):
+        # Only ask when someone is there to answer
+        if not any([args.subject_code, args.fail_rate, args.all]) and sys.stdin.isatty():
             response = input("\nShow subject analysis for this candidate's subject code? (y/n): ").strip().lower()
             if response == 'y':
+                stats = compute_stats()
                 subject_code = args.roll[:3]
                 print("\n" + "="*70)
                 if subject_code in stats["total_counts"]:
@@ -156,7 +318,8 @@ def main():
                     print(f"No subject analysis available for code: {subject_code}")
 
     if any([args.subject_code, args.fail_rate, args.all]):
-        print(f"{'='*70}\nTotal Candidates: {len(data)}, Passed = {stats['overall_passed']}, Failed = {stats['overall_failed']}")
+        stats = stats or compute_stats()
+        print(f"{'='*70}\nTotal Candidates: {stats['total_candidates']}, Passed = {stats['overall_passed']}, Failed = {stats['overall_failed']}")
         fail_percentages = calculate_fail_percentages(stats["total_counts"], stats["failed_counts"])
 
         if args.subject_code:
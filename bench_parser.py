@@ -0,0 +1,105 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Microbenchmark for result_parser.parse_result on the saved
+# PASSED/FAILED/malformed pages in fixtures/, next to the original
+# multi-query XPath parser it replaced. Also checks both agree on every page.
+#
+# Usage: python bench_parser.py [-n ITERATIONS]
+# ------------------------------------------------------------------------------
+
+import argparse
+import time
+
+from lxml import html
+
+from result_parser import parse_result
+
+FIXTURES = {
+    'passed': ('fixtures/result_passed.html', '201000123'),
+    'failed': ('fixtures/result_failed.html', '201000124'),
+    'malformed': ('fixtures/result_malformed.html', '201000125'),
+}
+
+
+def legacy_parse_result(roll, content):
+    doc = html.fromstring(content)
+    result_status = doc.xpath('//span[@class="red12bold"]/text()')
+
+    result_data = {
+        'roll': roll,
+        'status': None,
+        'position': None,
+        'subject': None,
+        'personal_details': {}
+    }
+
+    if result_status and result_status[0] == 'CONGRATULATIONS, PASSED THE FINAL EXAM':
+        result_data['status'] = 'PASSED'
+        td = doc.xpath('//span[@class="red12bold"]/parent::td')[0]
+
+        position = td.xpath('./span[@class="black12bold"][2]/text()')[0]
+        result_data['position'] = position.strip()
+
+        subject = td.xpath('./span[@class="black12bold"][3]/text()')[0]
+        result_data['subject'] = subject.strip()
+
+        personal_details = td.xpath('./text()')
+        cleaned_details = [line.strip() for line in personal_details if line.strip()]
+        details_dict = {}
+
+        for line in cleaned_details:
+            if ':' in line:
+                key, value = line.split(':', 1)
+                if key == 'Roll':
+                    continue
+                details_dict[key.strip()] = value.strip()
+
+        result_data['personal_details'] = details_dict
+    else:
+        assert result_status[0] == 'SORRY! YOU ARE NOT QUALIFIED!'
+        result_data['status'] = 'FAILED'
+
+    return result_data
+
+
+def run(parser, roll, content):
+    try:
+        return parser(roll, content)
+    except Exception as e:
+        return type(e).__name__
+
+
+def pages_per_second(parser, roll, content, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        run(parser, roll, content)
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed if elapsed > 0 else 0
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark the result page parser.")
+    arg_parser.add_argument("-n", "--iterations", type=int, default=20000, help="Pages parsed per fixture (default: 20000)")
+    args = arg_parser.parse_args()
+
+    print(f"{'Fixture':<10} {'legacy pages/s':>15} {'parser pages/s':>15} {'speedup':>8}")
+    print("-" * 52)
+    for name, (path, roll) in FIXTURES.items():
+        with open(path, 'rb') as f:
+            content = f.read()
+
+        legacy = run(legacy_parse_result, roll, content)
+        current = run(parse_result, roll, content)
+        if isinstance(legacy, dict) and legacy != current:
+            raise SystemExit(f"❌ Parsers disagree on {name}: {legacy} != {current}")
+
+        legacy_rate = pages_per_second(legacy_parse_result, roll, content, args.iterations)
+        current_rate = pages_per_second(parse_result, roll, content, args.iterations)
+        speedup = current_rate / legacy_rate if legacy_rate else 0
+        print(f"{name:<10} {legacy_rate:>15,.0f} {current_rate:>15,.0f} {speedup:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
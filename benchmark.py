@@ -0,0 +1,226 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: End-to-end throughput benchmark for the scrapers. Starts
+# mock_server.py with a set of mock proxies, then runs each engine as a
+# subprocess in its own temporary directory (synthetic all_rolls.json and a
+# proxy.txt pointing at the mock) and reports results/sec, requests/sec,
+# server-side p50/p99 latency, CPU time and peak RSS of the engine process.
+# Results can be saved as JSON and compared against an earlier run to catch
+# throughput regressions.
+#
+# Usage: python benchmark.py [--rolls 2000] [--engines get_result_multi ...]
+#        python benchmark.py --engine "mine=python my_engine.py" --output bench.json
+#        python benchmark.py --baseline bench.json
+# ------------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from result_store import RESULTS_STORE, FINAL_STATUSES, ResultStore
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+MOCK_SERVER = os.path.join(REPO_DIR, 'mock_server.py')
+
+# Engine name -> command, run from the benchmark's working directory
+ENGINES = {
+    'get_result': [sys.executable, os.path.join(REPO_DIR, 'get_result.py')],
+    'get_result_multi': [sys.executable, os.path.join(REPO_DIR, 'get_result_multi.py')],
+    'get_result_multi_async': [sys.executable, os.path.join(REPO_DIR, 'get_result_multi.py'), '--async'],
+}
+
+# Slow enough that the sequential scraper is only run when asked for
+DEFAULT_ENGINES = ['get_result_multi', 'get_result_multi_async']
+
+
+def synthetic_rolls(count, codes=30):
+    """`count` rolls spread evenly over `codes` subject codes starting at 101"""
+    return [f'{101 + i % codes:03d}{i // codes:06d}' for i in range(count)]
+
+
+def fetch_json(url, timeout=5):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def start_mock_server(args):
+    command = [
+        sys.executable, MOCK_SERVER,
+        '--port', str(args.port),
+        '--proxies', str(args.proxies),
+        '--dead-proxies', str(args.dead_proxies),
+        '--latency', str(args.latency),
+        '--jitter', str(args.jitter),
+        '--empty-rate', str(args.empty_rate),
+        '--error-rate', str(args.error_rate),
+        '--max-connections', str(args.max_connections),
+        '--seed', '1',
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    stats_url = f'http://127.0.0.1:{args.port}/__stats'
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            fetch_json(stats_url, timeout=1)
+            return process
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.kill()
+    raise Exception(f"Mock server did not start on port {args.port}")
+
+
+def proxy_urls(args):
+    if not args.proxies:
+        return [f'http://127.0.0.1:{args.port}']
+    return [f'http://127.0.0.1:{args.port + 1 + i}' for i in range(args.proxies)]
+
+
+def run_engine(name, command, args, rolls):
+    """Run one engine to completion against the mock server and collect its numbers"""
+    workdir = tempfile.mkdtemp(prefix=f'bench_{name}_')
+    with open(os.path.join(workdir, 'all_rolls.json'), 'w') as f:
+        json.dump(rolls, f)
+    with open(os.path.join(workdir, 'proxy.txt'), 'w') as f:
+        f.write('\n'.join(proxy_urls(args)) + '\n')
+
+    fetch_json(f'http://127.0.0.1:{args.port}/__reset')
+    log_path = os.path.join(workdir, 'engine.log')
+    with open(log_path, 'wb') as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=workdir, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+        timer = threading.Timer(args.timeout, process.kill)
+        timer.start()
+        try:
+            # wait4 reaps the child and hands back its own CPU time and peak RSS
+            _, status, usage = os.wait4(process.pid, 0)
+        finally:
+            timer.cancel()
+        elapsed = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+    server = fetch_json(f'http://127.0.0.1:{args.port}/__stats')
+
+    store = ResultStore(os.path.join(workdir, RESULTS_STORE), legacy_json=None)
+    saved = {roll for roll, status in store.iter_keys() if status in FINAL_STATUSES}
+    cpu = usage.ru_utime + usage.ru_stime
+    result = {
+        'engine': name,
+        'command': command,
+        'exit_code': process.returncode,
+        'rolls': len(rolls),
+        'saved': len(saved),
+        'elapsed': round(elapsed, 3),
+        'results_per_sec': round(len(saved) / elapsed, 2) if elapsed else 0.0,
+        'requests': server['requests'],
+        'requests_per_sec': round(server['requests'] / elapsed, 2) if elapsed else 0.0,
+        'p50': server['p50'],
+        'p99': server['p99'],
+        'server_counts': server['counts'],
+        'peak_active': server['peak_active'],
+        'cpu_seconds': round(cpu, 3),
+        'cpu_percent': round(100 * cpu / elapsed, 1) if elapsed else 0.0,
+        # ru_maxrss is in KiB on Linux
+        'max_rss_mb': round(usage.ru_maxrss / 1024, 1),
+    }
+    if args.keep:
+        result['workdir'] = workdir
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if process.returncode != 0 or len(saved) != len(rolls):
+        print(f"⚠️ {name} exited with {process.returncode} and saved {len(saved)}/{len(rolls)} rolls (log: {log_path if args.keep else 'removed, use --keep'})")
+    return result
+
+
+def print_report(results):
+    header = f"{'Engine':<26}{'Saved':>8}{'Time(s)':>9}{'Res/s':>9}{'Req/s':>9}{'p50(ms)':>9}{'p99(ms)':>9}{'CPU%':>7}{'RSS(MB)':>9}"
+    print("=" * len(header))
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['engine']:<26}{r['saved']:>8}{r['elapsed']:>9.2f}{r['results_per_sec']:>9.1f}"
+            f"{r['requests_per_sec']:>9.1f}{r['p50'] * 1000:>9.1f}{r['p99'] * 1000:>9.1f}"
+            f"{r['cpu_percent']:>7.1f}{r['max_rss_mb']:>9.1f}"
+        )
+    print("=" * len(header))
+
+
+def compare_baseline(results, baseline_file, tolerance):
+    """Print engines whose throughput dropped more than `tolerance` below the baseline"""
+    with open(baseline_file, 'r') as f:
+        baseline = {r['engine']: r for r in json.load(f)['results']}
+    regressions = 0
+    for r in results:
+        before = baseline.get(r['engine'])
+        if not before or not before['results_per_sec']:
+            continue
+        change = r['results_per_sec'] / before['results_per_sec'] - 1
+        if change < -tolerance:
+            regressions += 1
+            print(f"📉 {r['engine']}: {before['results_per_sec']:.1f} -> {r['results_per_sec']:.1f} results/sec ({change:+.1%})")
+        else:
+            print(f"✅ {r['engine']}: {before['results_per_sec']:.1f} -> {r['results_per_sec']:.1f} results/sec ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against the local mock server.")
+    parser.add_argument("--engines", nargs="+", choices=sorted(ENGINES), default=DEFAULT_ENGINES, help=f"Built-in engines to run (default: {' '.join(DEFAULT_ENGINES)})")
+    parser.add_argument("--engine", action="append", default=[], metavar="NAME=COMMAND", help="Extra engine command, run in the benchmark directory (repeatable)")
+    parser.add_argument("--rolls", type=int, default=2000, help="Synthetic rolls per run (default: 2000)")
+    parser.add_argument("--port", type=int, default=8765, help="Mock server port; proxy ports follow it (default: 8765)")
+    parser.add_argument("--proxies", type=int, default=4, help="Mock proxies (default: 4)")
+    parser.add_argument("--dead-proxies", type=int, default=0, help="Mock proxies that answer 502 (default: 0)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean server latency in seconds (default: 0.05)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Latency standard deviation (default: 0.02)")
+    parser.add_argument("--empty-rate", type=float, default=0.0, help="Fraction of empty responses (default: 0)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses (default: 0)")
+    parser.add_argument("--max-connections", type=int, default=0, help="Server overload limit (default: 0, unlimited)")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds before an engine run is killed (default: 600)")
+    parser.add_argument("--keep", action="store_true", help="Keep each run's working directory and log")
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Compare against a previous --output file")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed throughput drop against the baseline (default: 0.1)")
+    args = parser.parse_args()
+
+    engines = {name: ENGINES[name] for name in args.engines}
+    for spec in args.engine:
+        name, sep, command = spec.partition('=')
+        if not sep or not command:
+            parser.error(f"--engine expects NAME=COMMAND, got {spec!r}")
+        engines[name] = shlex.split(command)
+
+    rolls = synthetic_rolls(args.rolls)
+    server = start_mock_server(args)
+    results = []
+    try:
+        for name, command in engines.items():
+            print(f"⏱️ Running {name} on {len(rolls)} rolls...")
+            results.append(run_engine(name, command, args, rolls))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print_report(results)
+    if args.output:
+        settings = {key: value for key, value in vars(args).items() if key not in ('output', 'baseline', 'engine', 'engines')}
+        with open(args.output, 'w') as f:
+            json.dump({'settings': settings, 'results': results}, f, indent=4)
+        print(f"💾 Saved benchmark results to {args.output}")
+    if args.baseline and compare_baseline(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
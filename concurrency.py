@@ -0,0 +1,181 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Adaptive (AIMD) limit on in-flight requests. The limit grows by
+# one after each full window of healthy responses, but only while congestion
+# signals (timeouts, empty bodies, 5xx) are rare among the recent responses;
+# otherwise it holds. It is cut multiplicatively when latency drifts above the
+# target or as soon as the recent window holds enough congestion signals, seen
+# through more than one proxy. Isolated faults, or faults confined to a single
+# proxy, leave the limit alone, so the scraper settles at the rate the server
+# can sustain.
+# ------------------------------------------------------------------------------
+
+import asyncio
+import collections
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+
+
+class AIMDController:
+    def __init__(self, initial=20, min_limit=1, max_limit=100, increase=1, decrease=0.5,
+                 latency_target=5.0, cooldown=2.0, alpha=0.2, adaptive=True,
+                 window=100, failure_threshold=0.2, min_failing_proxies=2):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(max_limit if not adaptive else min(max(initial, min_limit), max_limit))
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.adaptive = adaptive
+        self.failure_threshold = failure_threshold
+        # Increases hold while this share of the recent outcomes failed
+        self.hold_threshold = failure_threshold / 2
+        self.min_failing_proxies = min_failing_proxies
+        # Last `window` outcomes as (failed, proxy)
+        self.outcomes = collections.deque(maxlen=window)
+        self.window_failures = 0
+        self.in_flight = 0
+        self.latency = None
+        self.successes = 0
+        self.last_decrease = 0.0
+        self.last_decision = "start"
+        self.condition = threading.Condition()
+        self.async_waiters = collections.deque()
+
+    def current_limit(self):
+        return int(self.limit)
+
+    def try_acquire(self):
+        with self.condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self, stop_event=None):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                if stop_event is not None and stop_event.is_set():
+                    raise Exception("Stopped by user")
+                self.condition.wait(timeout=1)
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        """Event-loop counterpart of acquire; waiters are woken by release()"""
+        loop = asyncio.get_running_loop()
+        while not self.try_acquire():
+            waiter = loop.create_future()
+            with self.condition:
+                self.async_waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, timeout=1)
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self._wake_locked()
+
+    def _wake_locked(self):
+        self.condition.notify_all()
+        free = int(self.limit) - self.in_flight
+        while self.async_waiters and free > 0:
+            waiter = self.async_waiters.popleft()
+            if not waiter.done():
+                waiter.get_loop().call_soon_threadsafe(_resolve, waiter)
+                free -= 1
+
+    @contextmanager
+    def slot(self, stop_event=None):
+        self.acquire(stop_event)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self):
+        await self.acquire_async()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _record_locked(self, failed, proxy):
+        if len(self.outcomes) == self.outcomes.maxlen:
+            self.window_failures -= self.outcomes[0][0]
+        self.outcomes.append((failed, proxy))
+        self.window_failures += failed
+
+    def on_success(self, latency, proxy=None):
+        with self.condition:
+            self._record_locked(False, proxy)
+            self.latency = latency if self.latency is None else self.latency + self.alpha * (latency - self.latency)
+            if not self.adaptive:
+                return
+            if self.latency > self.latency_target:
+                self._decrease_locked(f"latency {self.latency:.2f}s")
+                return
+            if self.window_failures >= self.hold_threshold * len(self.outcomes):
+                # Pushing harder while the server is still shedding load only
+                # turns its refusals into retries
+                self.successes = 0
+                self.last_decision = f"hold, {self.window_failures}/{len(self.outcomes)} failed"
+                return
+            self.successes += 1
+            if self.successes >= int(self.limit) and self.limit < self.max_limit:
+                old = int(self.limit)
+                self.limit = min(self.limit + self.increase, self.max_limit)
+                self.successes = 0
+                self.last_decision = f"+{self.increase} healthy"
+                print(f"📈 Concurrency limit {old} -> {int(self.limit)}")
+                self._wake_locked()
+
+    def on_failure(self, reason, proxy=None):
+        """Count a congestion signal (timeout, empty body or 5xx) and back off
+        once they add up to `failure_threshold` of the window, coming through
+        at least `min_failing_proxies` different proxies. The count is taken
+        against the full window size, so heavy congestion cuts before the
+        window has filled while scattered faults never can."""
+        with self.condition:
+            self._record_locked(True, proxy)
+            self.successes = 0
+            if not self.adaptive or self.window_failures < self.failure_threshold * self.outcomes.maxlen:
+                return
+            rate = self.window_failures / len(self.outcomes)
+            failing = {proxy for failed, proxy in self.outcomes if failed}
+            if len(failing) < self.min_failing_proxies:
+                return
+            self._decrease_locked(f"{reason}, {rate:.0%} failed")
+
+    def _decrease_locked(self, reason):
+        now = time.monotonic()
+        # One cut per round trip, at most per cool-down: the requests already
+        # in flight report the same congestion and must not collapse the limit
+        # to the floor, but fresh congestion after that must not wait either.
+        cooldown = min(self.cooldown, 2 * self.latency) if self.latency is not None else self.cooldown
+        if now - self.last_decrease < cooldown:
+            return
+        old = int(self.limit)
+        self.limit = max(self.limit * self.decrease, self.min_limit)
+        self.last_decrease = now
+        self.successes = 0
+        # The next cut needs fresh congestion signals at the new limit
+        self.outcomes.clear()
+        self.window_failures = 0
+        self.last_decision = f"x{self.decrease} {reason}"
+        print(f"📉 Concurrency limit {old} -> {int(self.limit)} ({reason})")
+
+    def status(self):
+        return f"Limit: {int(self.limit)} ({self.last_decision})"
+
+
+def _resolve(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
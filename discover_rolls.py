@@ -0,0 +1,378 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Finds rolls that are missing from the schedule PDFs by probing
+# the result server. A roll is its 3-digit subject-code prefix followed by a
+# 6-digit serial, and the live serials of a prefix form a few long runs. For
+# each prefix the known rolls are extended up and down by exponential probing
+# followed by a binary search for the bound, and the unknown stretches between
+# known rolls are sampled at a few points and only split further where the
+# samples disagree. A probe counts as live within a small window of serials, so
+# single holes (withdrawn candidates) do not end a run early. Only a complete
+# 200 page counts as an answer; proxy errors are retried on another proxy. Every
+# answer is cached per exam in roll_discovery.json, so a re-run only pays for
+# new ground. Only rolls the server confirmed are merged into all_rolls.json
+# (and kept there by extract_rolls.py);
+# serials inside stretches whose samples were all live, but that were never
+# probed themselves, are listed in estimated_rolls.json instead (--exhaustive
+# probes them, and a re-run with it only pays for those).
+#
+# Usage: python discover_rolls.py [--prefixes 101 205 ...] [--workers 4]
+#                                 [--samples 3] [--window 3] [--exhaustive] [--dry-run]
+# ------------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from lxml.etree import ParserError
+
+from exams import Exam, DEFAULT_EXAM, ROLLS_FILE
+from proxy_pool import ProxyPool, PROXY_STATUS_CODES
+from result_parser import parse_result, is_throttled
+from transport import Transport
+
+DISCOVERY_FILE = 'roll_discovery.json'
+ESTIMATED_FILE = 'estimated_rolls.json'
+PREFIX_DIGITS = 3
+SERIAL_DIGITS = 6
+MAX_SERIAL = 10 ** SERIAL_DIGITS - 1
+
+
+class Prober:
+    """Asks the server whether rolls have a result, remembering every answer"""
+
+    def __init__(self, exam, proxy_pool, transport, probes=None, max_attempts=6):
+        self.exam = exam
+        self.proxy_pool = proxy_pool
+        self.transport = transport
+        self.probes = probes if probes is not None else {}
+        self.max_attempts = max_attempts
+        # Proxy failures do not use up attempts, but a pool that never
+        # recovers must not keep a probe going forever
+        self.max_proxy_failures = max_attempts * len(proxy_pool)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def live(self, roll):
+        """True if the roll has a PASSED or FAILED result"""
+        with self.lock:
+            known = self.probes.get(roll)
+        if known is not None:
+            return known
+
+        attempt = proxy_failures = 0
+        while True:
+            with self.lock:
+                self.requests += 1
+            with self.proxy_pool.checkout() as proxy:
+                start = time.monotonic()
+                proxy_error = False
+                try:
+                    response = self.transport.post(self.exam.form_body(roll), proxy)
+                    content = response.content
+                    if response.status_code in PROXY_STATUS_CODES:
+                        proxy_error = True
+                        raise Exception(f"Proxy error {response.status_code}")
+                    # Only a complete result page says anything about the roll;
+                    # a 403 or an error page must not be cached as a dead roll
+                    if response.status_code != 200 or not content.strip() or is_throttled(response.status_code, content):
+                        raise Exception(f"Unusable response ({response.status_code}, {len(content)} bytes)")
+                    self.proxy_pool.report(proxy, True, time.monotonic() - start)
+                    break
+                except Exception as e:
+                    proxy_error = proxy_error or isinstance(e, requests.ConnectionError)
+                    self.proxy_pool.report(proxy, False)
+                    error = e
+            if proxy_error and proxy_failures < self.max_proxy_failures:
+                # Retry on another proxy, once one is available
+                proxy_failures += 1
+                time.sleep(self.proxy_pool.next_available_in())
+                continue
+            attempt += 1
+            if attempt == self.max_attempts:
+                raise Exception(f"Could not probe roll {roll}: {error}")
+            time.sleep(min(0.5 * 2 ** (attempt - 1), 30))
+
+        try:
+            parse_result(roll, content)
+            found = True
+        except (ValueError, ParserError):
+            found = False
+        with self.lock:
+            self.probes[roll] = found
+        return found
+
+
+class PrefixSearch:
+    """Range probing for the serials of one subject-code prefix"""
+
+    def __init__(self, prober, prefix, known, window=3, samples=3, exact_below=8, exhaustive=False):
+        self.prober = prober
+        self.prefix = prefix
+        self.known = sorted(known)
+        self.window = window
+        self.samples = samples
+        self.exact_below = exact_below
+        self.exhaustive = exhaustive
+
+    def roll(self, serial):
+        return f"{self.prefix}{serial:0{SERIAL_DIGITS}d}"
+
+    def live(self, serial):
+        return self.prober.live(self.roll(serial))
+
+    def live_near(self, serial, direction):
+        """First live serial among `window` serials from `serial` in `direction`, or None"""
+        for offset in range(self.window):
+            candidate = serial + direction * offset
+            if not 0 <= candidate <= MAX_SERIAL:
+                break
+            if self.live(candidate):
+                return candidate
+        return None
+
+    def find_seed(self):
+        """Some live serial of a prefix with no known rolls: 0, 1, 2, 4, 8, ..."""
+        serial = 0
+        while serial <= MAX_SERIAL:
+            found = self.live_near(serial, 1)
+            if found is not None:
+                return found
+            serial = serial * 2 or 1
+        return None
+
+    def find_bound(self, start, direction):
+        """Last live serial reached from live `start` in `direction`.
+
+        Steps double while they keep landing on live serials; the bound is then
+        binary searched between the last live step and the first dead one.
+        """
+        limit = MAX_SERIAL if direction > 0 else 0
+        last, step = start, 1
+        while True:
+            probe = last + direction * step
+            if direction * (probe - limit) > 0:
+                probe = limit
+            if probe == last:
+                return last
+            found = self.live_near(probe, direction)
+            if found is None:
+                dead = probe
+                break
+            last = found
+            step *= 2
+
+        # Invariant: `last` is live, nothing is live within the window from `dead`
+        while abs(dead - last) > 1:
+            middle = (last + dead) // 2
+            found = self.live_near(middle, direction)
+            if found is not None and direction * (dead - found) > 0:
+                last = found
+            else:
+                dead = middle
+        return last
+
+    def classify(self, first, last):
+        """(live, estimated) serials in the unknown stretch first..last.
+
+        Short stretches are probed serial by serial. Longer ones are sampled
+        evenly: all samples dead settles the stretch, mixed samples halve it
+        and each half is classified on its own. When all samples are live the
+        unprobed serials are only estimated live, unless `exhaustive` is set,
+        in which case they are probed one by one.
+        """
+        size = last - first + 1
+        if size <= self.exact_below:
+            return [serial for serial in range(first, last + 1) if self.live(serial)], []
+        points = sorted({first + (size - 1) * i // (self.samples - 1) for i in range(self.samples)})
+        outcomes = [self.live(point) for point in points]
+        if all(outcomes):
+            if self.exhaustive:
+                return [serial for serial in range(first, last + 1) if self.live(serial)], []
+            sampled = set(points)
+            return points, [serial for serial in range(first, last + 1) if serial not in sampled]
+        if not any(outcomes):
+            return [], []
+        middle = (first + last) // 2
+        low_live, low_estimated = self.classify(first, middle)
+        high_live, high_estimated = self.classify(middle + 1, last)
+        return low_live + high_live, low_estimated + high_estimated
+
+    def run(self):
+        """(live, estimated) sorted serials of the prefix; known ones count as live"""
+        known = self.known
+        if not known:
+            seed = self.find_seed()
+            if seed is None:
+                return [], []
+            known = [seed]
+        lowest = self.find_bound(known[0], -1)
+        highest = self.find_bound(known[-1], 1)
+
+        anchors = sorted(set(known) | {lowest, highest})
+        live = list(anchors)
+        estimated = []
+        for before, after in zip(anchors, anchors[1:]):
+            if after - before > 1:
+                stretch_live, stretch_estimated = self.classify(before + 1, after - 1)
+                live.extend(stretch_live)
+                estimated.extend(stretch_estimated)
+        return sorted(live), sorted(estimated)
+
+
+def as_ranges(serials):
+    """Sorted serials -> [[first, last], ...] runs"""
+    ranges = []
+    for serial in serials:
+        if ranges and serial == ranges[-1][1] + 1:
+            ranges[-1][1] = serial
+        else:
+            ranges.append([serial, serial])
+    return ranges
+
+
+def split_rolls(rolls):
+    """{prefix: [serial, ...]} for well-formed 9-digit rolls"""
+    by_prefix = {}
+    for roll in rolls:
+        if len(roll) == PREFIX_DIGITS + SERIAL_DIGITS and roll.isdigit():
+            by_prefix.setdefault(roll[:PREFIX_DIGITS], []).append(int(roll[PREFIX_DIGITS:]))
+    return by_prefix
+
+
+def load_discovery(filename=DISCOVERY_FILE):
+    """Discovery state of every exam, as {'exams': {exam_id: {'rolls', 'probes', 'prefixes'}}}"""
+    if not os.path.exists(filename):
+        return {'exams': {}}
+    with open(filename, 'r') as f:
+        discovery = json.load(f)
+    if 'exams' not in discovery:
+        # Older files kept one probe cache without saying which exam it was for
+        print(f"⚠️ Ignoring {filename}: probes are not keyed by exam, starting over")
+        return {'exams': {}}
+    return discovery
+
+
+def exam_discovery(discovery, exam_id, rolls_file):
+    """Probe cache and prefix ranges of one exam, created if missing"""
+    entry = discovery['exams'].setdefault(exam_id, {'probes': {}, 'prefixes': {}})
+    entry['rolls'] = os.path.abspath(rolls_file)
+    return entry
+
+def confirmed_rolls(rolls_file, filename=DISCOVERY_FILE):
+    """Rolls the server confirmed for the exams whose roll list is `rolls_file`"""
+    if not os.path.exists(filename):
+        return set()
+    rolls_file = os.path.abspath(rolls_file)
+    return {
+        roll
+        for entry in load_discovery(filename)['exams'].values()
+        if entry.get('rolls') == rolls_file
+        for roll, live in entry['probes'].items()
+        if live
+    }
+
+
+
+def save_json(filename, data):
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_filename, filename)
+
+
+def estimated_rolls(state):
+    """Estimated rolls of every prefix in an exam's discovery state"""
+    return [
+        f"{prefix}{serial:0{SERIAL_DIGITS}d}"
+        for prefix, entry in sorted(state['prefixes'].items())
+        for first, last in entry.get('estimated', [])
+        for serial in range(first, last + 1)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Discover rolls missing from the schedule PDFs by probing the result server.")
+    parser.add_argument("--prefixes", nargs="+", default=[], help="Subject-code prefixes to search besides those already in the roll list")
+    parser.add_argument("--only", action="store_true", help="Search only the --prefixes, not every prefix in the roll list")
+    parser.add_argument("--exam", default=DEFAULT_EXAM, help=f"Exam id sent with the form (default: {DEFAULT_EXAM})")
+    parser.add_argument("--rolls", default=ROLLS_FILE, help=f"Roll list to extend (default: {ROLLS_FILE})")
+    parser.add_argument("--discovery-file", default=DISCOVERY_FILE, help=f"Probe cache and discovered ranges, per exam (default: {DISCOVERY_FILE})")
+    parser.add_argument("--workers", type=int, default=4, help="Prefixes searched at the same time (default: 4)")
+    parser.add_argument("--window", type=int, default=3, help="Consecutive serials that must all be dead to end a run (default: 3)")
+    parser.add_argument("--samples", type=int, default=3, help="Probes per unknown stretch before it is split (default: 3)")
+    parser.add_argument("--exhaustive", action="store_true", help="Probe every serial of stretches whose samples were all live instead of estimating them")
+    parser.add_argument("--estimated-file", default=ESTIMATED_FILE, help=f"Where unprobed serials estimated live are listed (default: {ESTIMATED_FILE})")
+    parser.add_argument("--dry-run", action="store_true", help=f"Report what would be added without changing {ROLLS_FILE}")
+    args = parser.parse_args()
+    if args.samples < 2:
+        parser.error("--samples must be at least 2")
+
+    exam = Exam(args.exam, rolls_file=args.rolls)
+    rolls = exam.load_rolls() if os.path.exists(args.rolls) else []
+    by_prefix = split_rolls(rolls)
+    for prefix in args.prefixes:
+        if len(prefix) != PREFIX_DIGITS or not prefix.isdigit():
+            parser.error(f"Prefixes are {PREFIX_DIGITS}-digit subject codes, got {prefix!r}")
+    prefixes = sorted(set(args.prefixes) | (set() if args.only else set(by_prefix)))
+    if not prefixes:
+        parser.error(f"No prefixes to search: {args.rolls} is empty and no --prefixes were given")
+
+    discovery = load_discovery(args.discovery_file)
+    state = exam_discovery(discovery, args.exam, args.rolls)
+    proxy_pool = ProxyPool.from_file('proxy.txt')
+    proxy_pool.probe_all()
+    transport = Transport(pool_connections=len(proxy_pool))
+    prober = Prober(exam, proxy_pool, transport, state['probes'])
+
+    found = {}
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            searches = {
+                executor.submit(PrefixSearch(prober, prefix, by_prefix.get(prefix, []), args.window, args.samples, exhaustive=args.exhaustive).run): prefix
+                for prefix in prefixes
+            }
+            for future in as_completed(searches):
+                prefix = searches[future]
+                try:
+                    live, estimated = future.result()
+                except Exception as e:
+                    print(f"⚠️ Prefix {prefix}: {e}")
+                    continue
+                found[prefix] = live
+                known = len(by_prefix.get(prefix, []))
+                ranges = as_ranges(live)
+                state['prefixes'][prefix] = {'ranges': ranges, 'estimated': as_ranges(estimated), 'known': known, 'live': len(live)}
+                print(f"📋 {prefix}: {len(live) - known} new rolls, {len(estimated)} estimated, {len(ranges)} ranges, {ranges[0][0] if ranges else '-'}..{ranges[-1][1] if ranges else '-'}")
+    finally:
+        transport.close()
+        save_json(args.discovery_file, discovery)
+
+    known_rolls = set(rolls)
+    new_rolls = [
+        f"{prefix}{serial:0{SERIAL_DIGITS}d}"
+        for prefix, serials in found.items()
+        for serial in serials
+    ]
+    new_rolls = sorted(set(new_rolls) - known_rolls)
+    estimated = estimated_rolls(state)
+    print(f"ℹ️ {prober.requests} requests, {len(new_rolls)} new rolls across {len(found)} prefixes, {len(estimated)} estimated")
+    if args.dry_run:
+        return
+    save_json(args.estimated_file, estimated)
+    if estimated:
+        print(f"💾 Listed {len(estimated)} unprobed rolls in {args.estimated_file}; re-run with --exhaustive to confirm them")
+    if new_rolls:
+        # Same format as extract_rolls.py writes
+        save_json(args.rolls, sorted(known_rolls | set(new_rolls)))
+        print(f"💾 Added {len(new_rolls)} rolls to {args.rolls}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Exams for the scrapers. Each exam has its own form id, roll
+# list and working directory holding its result store, JSON export, subject
+# aggregate, dead letters and optional raw page archive, so results are keyed
+# by (exam, roll). A manifest
+# lists several exams for one scrape; interleave() merges their rolls so they
+# share a single connection, proxy and concurrency budget.
+#
+# Manifest: [{"exam": "18:18th:2023:3", "name": "18th", "rolls": "all_rolls.json"},
+#            {"exam": "17:17th:2022:3", "name": "17th", "rolls": "rolls_17th.json",
+#             "directory": "results/17th"}]
+# ------------------------------------------------------------------------------
+
+import json
+import os
+from urllib.parse import quote_plus, urlencode
+
+from raw_archive import ARCHIVE_DIR, RawArchive
+from result_store import RESULTS_STORE, RESULTS_JSON, ResultStore
+from retry_scheduler import RetryScheduler, DEAD_LETTERS_FILE
+from subject_stats import STATS_FILE
+
+DEFAULT_EXAM = '18:18th:2023:3'
+ROLLS_FILE = 'all_rolls.json'
+RESULTS_DIR = 'results'
+
+
+class Exam:
+    def __init__(self, exam_id=DEFAULT_EXAM, name=None, rolls_file=ROLLS_FILE, directory='.'):
+        self.exam_id = exam_id
+        self.name = name or (exam_id.split(':')[1] if ':' in exam_id else exam_id)
+        self.rolls_file = rolls_file
+        self.directory = directory
+        self.store = None
+        self.retry_scheduler = None
+        self.archive = None
+        # Everything after the roll, urlencoded once
+        self.form_suffix = urlencode({'exam': exam_id, 'yes': 'YES', 'button2': 'Submit'})
+
+    def __repr__(self):
+        return f"Exam({self.name!r})"
+
+    def path(self, filename):
+        if self.directory == '.':
+            return filename
+        return os.path.join(self.directory, filename)
+
+    def form(self, roll):
+        return {
+            'rollno': roll,
+            'exam': self.exam_id,
+            'yes': 'YES',
+            'button2': 'Submit',
+        }
+
+    def form_body(self, roll):
+        """form(roll) urlencoded, built from the prebuilt suffix"""
+        return f"rollno={quote_plus(roll)}&{self.form_suffix}"
+
+    def load_rolls(self):
+        with open(self.rolls_file, 'r') as f:
+            return json.load(f)
+
+    def open(self, max_attempts=10, archive=False):
+        """Open the exam's store, retry scheduler and, with `archive`, its raw page archive"""
+        os.makedirs(self.directory, exist_ok=True)
+        self.store = ResultStore(
+            self.path(RESULTS_STORE),
+            legacy_json=self.path(RESULTS_JSON),
+            stats_file=self.path(STATS_FILE),
+        ).open()
+        self.retry_scheduler = RetryScheduler(max_attempts=max_attempts, dead_letter_file=self.path(DEAD_LETTERS_FILE))
+        if archive:
+            self.archive = RawArchive(self.path(ARCHIVE_DIR)).open()
+        return self
+
+    def remaining_rolls(self, retry_failed=False):
+        """Rolls still to fetch; dead-lettered rolls only with `retry_failed`"""
+        processed_rolls = self.store.processed_rolls()
+        dead_letters = set(self.retry_scheduler.dead_letter_rolls())
+        for roll in dead_letters & processed_rolls:
+            self.retry_scheduler.resolve(roll)
+        if retry_failed:
+            return sorted(dead_letters - processed_rolls)
+        if dead_letters - processed_rolls:
+            print(f"☠️ {self.name}: skipping {len(dead_letters - processed_rolls)} dead-lettered rolls (use --retry-failed)")
+        return sorted(set(self.load_rolls()) - processed_rolls - dead_letters)
+
+    def close(self):
+        self.store.close()
+        self.retry_scheduler.save_dead_letters()
+        if self.archive is not None:
+            self.archive.close()
+
+    def export_json(self):
+        return self.store.export_json()
+
+
+def load_manifest(filename):
+    """Exams listed in a manifest file; relative paths are taken from the manifest's directory"""
+    with open(filename, 'r') as f:
+        entries = json.load(f)
+    base = os.path.dirname(os.path.abspath(filename))
+    exams = []
+    for entry in entries:
+        if 'exam' not in entry or 'rolls' not in entry:
+            raise ValueError(f"Manifest entries need 'exam' and 'rolls': {entry}")
+        exam = Exam(entry['exam'], entry.get('name'))
+        exam.rolls_file = os.path.join(base, entry['rolls'])
+        exam.directory = os.path.join(base, entry.get('directory', os.path.join(RESULTS_DIR, exam.name)))
+        exams.append(exam)
+    names = [exam.name for exam in exams]
+    if len(set(names)) != len(names):
+        raise ValueError("Manifest exam names must be unique")
+    return exams
+
+
+def interleave(work):
+    """Round-robin over {exam: rolls}, yielding (exam, roll) until every list is used up"""
+    iterators = [(exam, iter(rolls)) for exam, rolls in work.items()]
+    while iterators:
+        active = []
+        for exam, rolls in iterators:
+            roll = next(rolls, None)
+            if roll is not None:
+                yield exam, roll
+                active.append((exam, rolls))
+        iterators = active
@@ -0,0 +1,312 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Per-subject-code export of the results. all_results.json is
+# streamed once and every record is flattened (personal_details become the
+# name/father/mother columns) and routed to the shard of its roll[:3] code.
+# Rows are buffered per shard and written in bulk through a small LRU of open
+# files, so hundreds of codes never hold hundreds of handles. Shards are
+# written as JSON lines first; CSV and Parquet (needs pyarrow) are converted
+# from those one shard at a time, optionally across a process pool. The
+# manifest.json written last lists every shard with its row count. When the
+# store sits next to the source, the counts are checked against the store's
+# roll index and the export fails if the JSON is out of date with the store.
+# Exports go to exports/, apart from the worker shards of work_queue.py.
+#
+# Usage: python export_shards.py [--formats csv jsonl parquet] [--output exports]
+#                                [--processes 4] [--max-open 64]
+#        python export_shards.py --manifest exams.json
+# ------------------------------------------------------------------------------
+
+import argparse
+import csv
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from exams import load_manifest
+from result_store import RESULTS_JSON, RESULTS_STORE, ROLL_INDEX, iter_json_array, update_roll_index
+from sorted_index import SortedIndex
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Not "shards": work_queue.py keeps its per-worker stores there
+EXPORTS_DIR = "exports"
+MANIFEST_FILE = "manifest.json"
+FORMATS = ("csv", "jsonl", "parquet")
+FIELDS = ("roll", "status", "position", "subject", "name", "father", "mother")
+DETAIL_FIELDS = {"name": "Name", "father": "Father", "mother": "Mother"}
+# Shards are spooled as JSON lines when jsonl itself is not requested
+SPOOL_SUFFIX = ".jsonl.spool"
+
+
+def flatten(record):
+    details = record.get("personal_details") or {}
+    flat = {field: record.get(field) for field in FIELDS[:4]}
+    for field, key in DETAIL_FIELDS.items():
+        flat[field] = details.get(key)
+    return flat
+
+
+class HandleCache:
+    """At most `max_open` append handles; the least recently used one is closed first"""
+
+    def __init__(self, max_open=64):
+        self.max_open = max_open
+        self.handles = OrderedDict()
+        self.created = set()
+        self.opens = 0
+
+    def get(self, path):
+        handle = self.handles.get(path)
+        if handle is not None:
+            self.handles.move_to_end(path)
+            return handle
+        if len(self.handles) >= self.max_open:
+            _, oldest = self.handles.popitem(last=False)
+            oldest.close()
+        # Truncate a leftover file from an earlier export on first use, append after that
+        mode = 'a' if path in self.created else 'w'
+        handle = open(path, mode, encoding='utf-8', buffering=1 << 16)
+        self.created.add(path)
+        self.handles[path] = handle
+        self.opens += 1
+        return handle
+
+    def close(self):
+        for handle in self.handles.values():
+            handle.close()
+        self.handles.clear()
+
+
+class ShardRouter:
+    """Buffers flattened rows per code and writes each buffer with a single write()"""
+
+    def __init__(self, directory, suffix, max_open=64, shard_buffer=1 << 20, total_buffer=64 << 20):
+        self.directory = directory
+        self.suffix = suffix
+        self.cache = HandleCache(max_open)
+        self.shard_buffer = shard_buffer
+        self.total_buffer = total_buffer
+        self.buffers = {}
+        self.buffer_sizes = {}
+        self.buffered = 0
+        self.rows = {}
+        # code -> (position, subject) of its first PASSED result, for the manifest
+        self.subjects = {}
+        self.skipped = 0
+
+    def path(self, code):
+        return os.path.join(self.directory, code + self.suffix)
+
+    def add(self, record):
+        roll = record.get("roll", "")
+        if len(roll) < 3:
+            # process_data does not count these under any code either
+            self.skipped += 1
+            return
+        code = roll[:3]
+        if code not in self.subjects and record.get("status") == "PASSED" and record.get("position") and record.get("subject"):
+            self.subjects[code] = (record["position"], record["subject"])
+        line = json.dumps(flatten(record), ensure_ascii=False) + '\n'
+        buffer = self.buffers.get(code)
+        if buffer is None:
+            buffer = self.buffers[code] = []
+            self.buffer_sizes[code] = 0
+            self.rows.setdefault(code, 0)
+        buffer.append(line)
+        self.rows[code] += 1
+        self.buffer_sizes[code] += len(line)
+        self.buffered += len(line)
+        if self.buffer_sizes[code] >= self.shard_buffer:
+            self.flush(code)
+        elif self.buffered >= self.total_buffer:
+            self.flush_all()
+
+    def flush(self, code):
+        buffer = self.buffers.pop(code, None)
+        if buffer:
+            self.cache.get(self.path(code)).write(''.join(buffer))
+            self.buffered -= self.buffer_sizes.pop(code)
+
+    def flush_all(self):
+        for code in sorted(self.buffers):
+            self.flush(code)
+
+    def close(self):
+        self.flush_all()
+        self.cache.close()
+
+
+def read_rows(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def convert_shard(code, source, directory, formats, batch_rows=50000):
+    """Write the CSV and/or Parquet file of one shard from its JSON lines; returns (code, rows, {format: file})"""
+    files = {}
+    rows = 0
+    if "csv" in formats:
+        filename = os.path.join(directory, code + ".csv")
+        with open(filename + ".tmp", 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            batch = []
+            for row in read_rows(source):
+                batch.append([row[field] for field in FIELDS])
+                if len(batch) >= batch_rows:
+                    writer.writerows(batch)
+                    rows += len(batch)
+                    batch = []
+            writer.writerows(batch)
+            rows += len(batch)
+        os.replace(filename + ".tmp", filename)
+        files["csv"] = os.path.basename(filename)
+    if "parquet" in formats:
+        filename = os.path.join(directory, code + ".parquet")
+        columns = {field: [] for field in FIELDS}
+        for row in read_rows(source):
+            for field in FIELDS:
+                columns[field].append(row[field])
+        table = pyarrow.table({field: pyarrow.array(values, type=pyarrow.string()) for field, values in columns.items()})
+        pyarrow.parquet.write_table(table, filename + ".tmp")
+        os.replace(filename + ".tmp", filename)
+        rows = table.num_rows
+        files["parquet"] = os.path.basename(filename)
+    return code, rows, files
+
+
+def remove_previous(directory):
+    """Delete the files listed by an earlier export's manifest"""
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+    for shard in previous.get("shards", {}).values():
+        for filename in shard.get("files", {}).values():
+            path = os.path.join(directory, filename)
+            if os.path.exists(path):
+                os.remove(path)
+    os.remove(manifest_path)
+
+
+def store_row_counts(source):
+    """Results per code in the store next to `source`, from its roll index; None without a store"""
+    folder = os.path.dirname(source)
+    store_path = os.path.join(folder, RESULTS_STORE)
+    if not os.path.exists(store_path):
+        return None
+    index_path = update_roll_index(store_path, os.path.join(folder, ROLL_INDEX))
+    counts = {}
+    with SortedIndex(index_path) as index:
+        for key, _ in index.items():
+            roll = key.decode('utf-8').rstrip()
+            if len(roll) >= 3:
+                counts[roll[:3]] = counts.get(roll[:3], 0) + 1
+    return counts
+
+
+def export_shards(source=RESULTS_JSON, directory=EXPORTS_DIR, formats=("csv",), processes=1, max_open=64):
+    """Export `source` into per-code shards under `directory` and return the manifest"""
+    if "parquet" in formats and pyarrow is None:
+        raise Exception("Parquet output needs pyarrow: pip install pyarrow")
+    started = time.monotonic()
+    os.makedirs(directory, exist_ok=True)
+    remove_previous(directory)
+
+    suffix = ".jsonl" if "jsonl" in formats else SPOOL_SUFFIX
+    router = ShardRouter(directory, suffix, max_open)
+    try:
+        for record in iter_json_array(source):
+            router.add(record)
+    finally:
+        router.close()
+    print(f"📥 Streamed {sum(router.rows.values()) + router.skipped} results into {len(router.rows)} shards ({router.cache.opens} file opens)")
+
+    expected = store_row_counts(source)
+    if expected is not None and expected != router.rows:
+        raise Exception(f"{source} is out of date with {RESULTS_STORE}; re-export it before exporting shards")
+
+    files = {code: {"jsonl": code + ".jsonl"} if suffix == ".jsonl" else {} for code in router.rows}
+    conversions = [fmt for fmt in formats if fmt != "jsonl"]
+    if conversions:
+        codes = list(router.rows)
+        arguments = (codes, [router.path(code) for code in codes],
+                     [directory] * len(codes), [conversions] * len(codes))
+        if processes > 1:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                converted = list(executor.map(convert_shard, *arguments, chunksize=max(1, len(codes) // (processes * 4))))
+        else:
+            converted = list(map(convert_shard, *arguments))
+        for code, rows, written in converted:
+            if rows != router.rows[code]:
+                raise Exception(f"Shard {code}: wrote {rows} rows, expected {router.rows[code]}")
+            files[code].update(written)
+        if suffix == SPOOL_SUFFIX:
+            for code in codes:
+                os.remove(router.path(code))
+
+    manifest = {
+        "source": os.path.abspath(source),
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "formats": list(formats),
+        "fields": list(FIELDS),
+        "total_rows": sum(router.rows.values()),
+        "skipped_rows": router.skipped,
+        "shards": {
+            code: {
+                "rows": rows,
+                "position": router.subjects.get(code, (None, None))[0],
+                "subject": router.subjects.get(code, (None, None))[1],
+                "files": files[code],
+            }
+            for code, rows in sorted(router.rows.items())
+        },
+    }
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=4)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    print(f"💾 Wrote {len(manifest['shards'])} shards, {manifest['total_rows']} rows to {directory} in {time.monotonic() - started:.1f}s")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the results as one file per subject code.")
+    parser.add_argument("--input", default=RESULTS_JSON, help=f"Results JSON array to export (default: {RESULTS_JSON})")
+    parser.add_argument("--output", default=EXPORTS_DIR, help=f"Directory for the shards and {MANIFEST_FILE} (default: {EXPORTS_DIR})")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=["csv"], help="Shard formats to write (default: csv)")
+    parser.add_argument("--processes", type=int, default=1, help="Processes converting shards to CSV/Parquet (default: 1)")
+    parser.add_argument("--max-open", type=int, default=64, help="Shard files kept open at once while streaming (default: 64)")
+    parser.add_argument("--manifest", help="Export every exam of this manifest into its own directory (see get_result_multi.py)")
+    args = parser.parse_args()
+    if "parquet" in args.formats and pyarrow is None:
+        parser.error("Parquet output needs pyarrow: pip install pyarrow")
+    formats = tuple(dict.fromkeys(args.formats))
+
+    if args.manifest:
+        jobs = [(exam.path(RESULTS_JSON), exam.path(EXPORTS_DIR)) for exam in load_manifest(args.manifest)]
+    else:
+        jobs = [(args.input, args.output)]
+    for source, directory in jobs:
+        if not os.path.exists(source):
+            print(f"❌ {source} not found")
+            continue
+        try:
+            export_shards(source, directory, formats, args.processes, args.max_open)
+        except Exception as e:
+            print(f"❌ Exporting {source} failed: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,15 @@
 # Copyright (c) 2025 Mahfujar Rahman
 # Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
 # Created: 2025-06-05
-# Description: This script extracts all 9-digit roll numbers from a list of 
-# ntrca viva schedule PDF files and stores them in a JSON file.
+# Description: This script extracts all 9-digit roll numbers from the ntrca
+# viva schedule PDF files in schedules/ and stores them in a JSON file. Files
+# are split into page ranges that a process pool works through in parallel,
+# matching rolls page by page as the text is extracted. Rolls found per file
+# are cached by content hash, so re-runs only parse new or changed PDFs, and a
+# roll -> viva date/file/page index is written alongside (schedule_index.py).
+# Rolls that discover_rolls.py confirmed on the server are kept in the list.
+#
+# Usage: python extract_rolls.py [--workers N] [--chunk-pages N] [--rebuild]
 # ------------------------------------------------------------------------------
 
 
@@ -11,34 +18,146 @@
 import PyPDF2
 import re
 import json
+import os
+import argparse
+import glob
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from schedule_index import page_date, resolve_page_dates, build_schedule_index, SEASON_START_YEAR
+from exams import ROLLS_FILE
+from discover_rolls import confirmed_rolls
 
-viva_schedule_pdf_files = [
-    '27_10_to_13_11.pdf',
-    '14_11_to_04_12.pdf',
-    '5_12_to_2_01.pdf',
-    '5_01_to_23_01.pdf',
-    '26_01_to_13_02.pdf',
-    '16_02_to_6_03.pdf',
-    '9_03_to_20_03_n_6_04_to_30_04.pdf',
-    '23_03.pdf',
-    '4_05_to_29_05.pdf',
-    '31_05.pdf'
-]
-
-all_rolls = set()
-
-for pdf in viva_schedule_pdf_files:
-    print('Procesing: ', pdf)
-    with open(f'schedules/{pdf}', "rb") as file:
+SCHEDULE_DIR = 'schedules'
+CACHE_FILE = 'extract_cache.json'
+# Bump when the extracted pages change for the same PDF, e.g. a fix to page
+# dates, so cached entries are parsed again
+CACHE_VERSION = 2
+
+ROLL_PATTERN = re.compile(r'\b\d{9}\b')
+
+
+def discover_pdfs(directory=SCHEDULE_DIR):
+    return sorted(glob.glob(os.path.join(directory, '*.pdf')))
+
+
+def file_key(path):
+    """Cache key for a PDF: its SHA-256 and size, independent of the file name"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return f'{digest.hexdigest()}:{os.path.getsize(path)}'
+
+
+def load_cache(filename=CACHE_FILE):
+    if not os.path.exists(filename):
+        return {}
+    try:
+        with open(filename, "r") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f'⚠️ Ignoring unreadable cache {filename}: {e}')
+        return {}
+
+
+def save_cache(cache, filename=CACHE_FILE):
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, "w") as f:
+        json.dump(cache, f)
+    os.replace(temp_filename, filename)
+
+
+def count_pages(path):
+    with open(path, "rb") as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def extract_page_range(path, start, end):
+    """[page_number, header_date, rolls] for every page in [start, end) of one PDF"""
+    pages = []
+    with open(path, "rb") as file:
         reader = PyPDF2.PdfReader(file)
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text()
+        for page_number in range(start, end):
+            page_text = reader.pages[page_number].extract_text()
             if page_text:
-                text += page_text
+                rolls = sorted(set(ROLL_PATTERN.findall(page_text)))
+                if rolls:
+                    pages.append([page_number + 1, page_date(page_text), rolls])
+    return pages
+
+
+def plan_chunks(paths, chunk_pages):
+    chunks = []
+    for path in paths:
+        pages = count_pages(path)
+        for start in range(0, pages, chunk_pages):
+            chunks.append((path, start, min(start + chunk_pages, pages)))
+    return chunks
+
+
+def extract_rolls(paths, workers=None, chunk_pages=25):
+    """Pages with rolls found in each of `paths`, as {path: [[page, date, rolls], ...]}"""
+    pages_by_file = {path: [] for path in paths}
+    if not paths:
+        return pages_by_file
+    chunks = plan_chunks(paths, chunk_pages)
+    print(f'Processing {len(paths)} files in {len(chunks)} page ranges')
+    if workers == 1:
+        for chunk in chunks:
+            pages_by_file[chunk[0]].extend(extract_page_range(*chunk))
+        return pages_by_file
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(extract_page_range, *chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            path, start, end = futures[future]
+            pages = future.result()
+            rolls = sum(len(page[2]) for page in pages)
+            print(f'Processed: {os.path.basename(path)} pages {start + 1}-{end} ({rolls} rolls)')
+            pages_by_file[path].extend(pages)
+    return pages_by_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract roll numbers from NTRCA viva schedule PDFs.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: CPU count, 1 disables the pool)")
+    parser.add_argument("--chunk-pages", type=int, default=25, help="Pages per work item (default: 25)")
+    parser.add_argument("--schedules", default=SCHEDULE_DIR, help=f"Directory with the schedule PDFs (default: {SCHEDULE_DIR})")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the extraction cache and parse every PDF")
+    parser.add_argument("--season-start-year", type=int, default=SEASON_START_YEAR, help=f"Year of the first viva, for dates taken from file names (default: {SEASON_START_YEAR})")
+    args = parser.parse_args()
+
+    paths = discover_pdfs(args.schedules)
+    cache = {} if args.rebuild else load_cache()
+    keys = {path: file_key(path) for path in paths}
+
+    changed = [path for path in paths if cache.get(keys[path], {}).get('version') != CACHE_VERSION]
+    print(f'Found {len(paths)} schedule PDFs, {len(changed)} new or changed')
+    for path, pages in extract_rolls(changed, args.workers, args.chunk_pages).items():
+        cache[keys[path]] = {'version': CACHE_VERSION, 'file': os.path.basename(path), 'pages': sorted(pages)}
+
+    # Only keep entries for PDFs that are still in the schedule directory
+    cache = {keys[path]: cache[keys[path]] for path in paths}
+    save_cache(cache)
+
+    all_rolls = set()
+    schedule = {}
+    for entry in cache.values():
+        for _, _, rolls in entry['pages']:
+            all_rolls.update(rolls)
+        schedule[entry['file']] = resolve_page_dates(entry['file'], entry['pages'], args.season_start_year)
+    indexed = build_schedule_index(schedule)
+    print(f'Indexed {indexed} rolls by viva date')
+
+    print('total rolls found: ', len(all_rolls))
+    # The schedules miss some rolls; keep the ones probing found on the server
+    discovered = confirmed_rolls(ROLLS_FILE) - all_rolls
+    if discovered:
+        print(f'Kept {len(discovered)} rolls found by discover_rolls.py')
+        all_rolls |= discovered
+    with open(ROLLS_FILE, "w") as f:
+        json.dump(sorted(all_rolls), f)
+
 
-    rolls = re.findall(r'\b\d{9}\b', text)
-    all_rolls.update(rolls)
-print('total rolls found: ', len(all_rolls))
-with open("all_rolls.json", "w") as f:
-    json.dump(sorted(all_rolls), f)
+if __name__ == "__main__":
+    main()
@@ -3,146 +3,404 @@
 # Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
 # Created: 2025-06-05
 # Description: Multithreaded scraper for NTRCA final results via Teletalk site.
-# Handles retries, proxy rotation, user-agent spoofing, and async JSON saving.
+# Handles backoff retries, proxy rotation, user-agent spoofing, and async saving to the append-only store.
+# Optional --async mode runs every request on one asyncio event loop.
+# Progress is a periodic status line; detailed timings go to metrics.json.
+# --manifest scrapes several exams at once, interleaving their rolls over the
+# same proxies and concurrency budget and saving each exam to its own store.
+# --queue turns the process into one of several workers claiming leased roll
+# ranges from a shared work queue (see work_queue.py). --archive keeps the raw
+# pages for offline re-parsing (see raw_archive.py). Work is fed to the pool
+# through a bounded window, optionally ordered by --first-rolls,
+# --priority-prefix or --viva-order so the most urgent results arrive first.
+# Requests go through transport.py: a keep-alive session per thread and user
+# agents loaded once instead of per roll.
 # ------------------------------------------------------------------------------
 
-import json
 import requests
-from lxml import html
-from fake_useragent import UserAgent
-import os
-from retry import retry
+import json
 import time
-from datetime import timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import threading
 import sys
 import queue
-import random
+import asyncio
+import argparse
+from result_parser import parse_result
+from proxy_pool import ProxyPool, PROXY_STATUS_CODES
+from transport import Transport, RESULT_URL
+from concurrency import AIMDController
+from retry_scheduler import DEAD_LETTERS_FILE
+from exams import Exam, DEFAULT_EXAM, load_manifest, interleave
+from schedule_index import ScheduleIndex
+from work_queue import WorkQueue, LeaseKeeper, QUEUE_FILE, default_worker_id, shard_exam, canonical_rolls
+from metrics import Metrics, StatusReporter, METRICS_FILE
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
 
 stop_event = threading.Event()
-save_lock = threading.Lock()
 result_queue = queue.Queue()
 
-with open('proxy.txt') as f:
-    proxy_list = [line.strip() for line in f if line.strip()]
-proxy = random.choice(proxy_list)
-proxies = {
-    'http': proxy,
-    'https': proxy,
-}
+proxy_pool = ProxyPool.from_file('proxy.txt')
+
+controller = AIMDController()
+transport = None
+exams = []
+metrics = Metrics()
+
+def proxy_error_reason(status_code):
+    """Why a response is the proxy's fault, or None when it passed through"""
+    if status_code in PROXY_STATUS_CODES:
+        return f"Proxy error {status_code}"
+    return None
+
+class ProxyFailure(Exception):
+    """The proxy, not the server, failed the request; retried on another proxy without using up an attempt"""
 
-@retry(tries=30, delay=5)
-def fetch_result(roll, headers, data, proxies):
+def is_proxy_error(error):
+    """Connection failures on the hop to the proxy; connect timeouts included"""
+    if isinstance(error, requests.ConnectionError):
+        return True
+    return aiohttp is not None and isinstance(error, (aiohttp.ClientProxyConnectionError, aiohttp.ConnectionTimeoutError))
+
+def congestion_reason(status_code, content):
+    """Why a response counts as server push-back, or None when it is usable"""
+    if status_code >= 500:
+        return f"Server error {status_code}"
+    if not content.strip():
+        return "Empty response"
+    return None
+
+def failure_counter(reason):
+    return "empty_bodies" if reason == "Empty response" else "server_errors"
+
+def check_response(roll, proxy, status_code, content):
+    """Raise for an unusable response. Only server push-back reaches the
+    controller; a failing proxy is the pool's business and must not slow
+    down the healthy ones."""
+    reason = proxy_error_reason(status_code)
+    if reason:
+        metrics.inc("proxy_errors", label=proxy)
+        raise ProxyFailure(f"{reason} for roll {roll}")
+    reason = congestion_reason(status_code, content)
+    if reason:
+        controller.on_failure(reason, proxy)
+        metrics.inc(failure_counter(reason), label=proxy)
+        raise Exception(f"{reason} for roll {roll}")
+
+def fetch_result(roll, data):
     if stop_event.is_set():
         raise Exception("Stopped by user")
+    # The proxy is picked once a slot is free, so waiting requests do not
+    # hold on to a proxy that gets ejected in the meantime
+    with controller.slot(stop_event), proxy_pool.checkout() as proxy:
+        metrics.inc("requests", label=proxy)
+        start = time.monotonic()
+        try:
+            response = transport.post(data, proxy)
+            latency = time.monotonic() - start
+            metrics.observe("request_time", latency)
+            # Time from sending the request until the response headers arrived
+            metrics.observe("server_time", response.elapsed.total_seconds())
+            check_response(roll, proxy, response.status_code, response.content)
+            proxy_pool.report(proxy, True, latency)
+            controller.on_success(latency, proxy)
+            return response
+        except Exception as e:
+            if isinstance(e, requests.Timeout):
+                metrics.inc("timeouts", label=proxy)
+                if not is_proxy_error(e):
+                    controller.on_failure("timeout", proxy)
+            proxy_pool.report(proxy, False)
+            if is_proxy_error(e):
+                metrics.inc("proxy_errors", label=proxy)
+                raise ProxyFailure(f"Proxy connection failed for roll {roll}: {e}") from e
+            raise
+
+def pop_due_retries(limit=None):
+    """Due retries across all exams as (exam, roll, attempts_so_far)"""
+    due = []
+    for exam in exams:
+        if limit is not None and len(due) >= limit:
+            break
+        for roll, attempt in exam.retry_scheduler.pop_due(None if limit is None else limit - len(due)):
+            due.append((exam, roll, attempt))
+    return due
+
+def pending_retries():
+    return sum(len(exam.retry_scheduler) for exam in exams)
+
+def next_retry_in():
+    waits = [wait_for for wait_for in (exam.retry_scheduler.next_due_in() for exam in exams) if wait_for is not None]
+    return min(waits) if waits else None
+
+def handle_failure(exam, roll, attempt, error):
+    """Hand a failed attempt to the retry scheduler instead of sleeping in the worker.
+
+    A proxy failure says nothing about the roll: it goes straight back to the
+    queue for another proxy, keeping its attempt count and skipping backoff.
+    That includes the failed re-probe of an ejected proxy, which would
+    otherwise drag the roll through the proxy's own cool-downs.
+    """
+    metrics.inc("errors")
+    if isinstance(error, ProxyFailure):
+        exam.retry_scheduler.requeue(roll, attempt, proxy_pool.next_available_in())
+        metrics.inc("proxy_requeues")
+    else:
+        delay = exam.retry_scheduler.schedule(roll, attempt + 1, error)
+        metrics.inc("retries" if delay is not None else "dead_letters")
+    metrics.set("last_error", f"{exam.name} {roll}: {error}")
+    return {
+        'roll': roll,
+        'status': 'ERROR',
+        'error': str(error)
+    }
+
+def record_result(exam, roll, content):
+    if exam.archive is not None:
+        with metrics.timer("archive_time"):
+            exam.archive.add(roll, content)
+    with metrics.timer("parse_time"):
+        result_data = parse_result(roll, content)
+    result_queue.put((exam, result_data))
+    exam.retry_scheduler.resolve(roll)
+    metrics.inc("completed")
+    metrics.inc("statuses", label=result_data['status'])
+    return result_data
+
+def process_roll(exam, roll, attempt):
+    if stop_event.is_set():
+        return None
+    
     try:
-        response = requests.post(
-            'http://ntrca.teletalk.com.bd/result/index.php',
-            headers=headers,
-            data=data,
-            verify=False,
-            proxies=proxies,
-            timeout=15
-        )
-        if not response.content.strip():
-            raise Exception(f"Empty response for roll {roll}")
-        return response
+        response = fetch_result(roll, exam.form_body(roll))
+        return record_result(exam, roll, response.content)
+
     except Exception as e:
-        print(f"❌ Retry error for roll {roll}: {e}")
-        raise
+        return handle_failure(exam, roll, attempt, e)
+
+async def fetch_result_async(session, roll, data):
+    """Async counterpart of fetch_result"""
+    if stop_event.is_set():
+        raise Exception("Stopped by user")
+    async with controller.slot_async():
+        with proxy_pool.checkout() as proxy:
+            metrics.inc("requests", label=proxy)
+            start = time.monotonic()
+            try:
+                try:
+                    async with session.post(
+                        RESULT_URL,
+                        headers=transport.headers(),
+                        data=data,
+                        proxy=proxy,
+                        # Per-phase limits only: `total` would also count the wait
+                        # for a pooled connection and blame the queue on the server
+                        timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=15)
+                    ) as response:
+                        metrics.observe("server_time", time.monotonic() - start)
+                        content = await response.read()
+                except asyncio.TimeoutError as e:
+                    metrics.inc("timeouts", label=proxy)
+                    if not is_proxy_error(e):
+                        controller.on_failure("timeout", proxy)
+                    raise Exception(f"Timed out for roll {roll}") from e
+                latency = time.monotonic() - start
+                metrics.observe("request_time", latency)
+                check_response(roll, proxy, response.status, content)
+            except Exception as e:
+                proxy_pool.report(proxy, False)
+                cause = e.__cause__ or e
+                if not isinstance(e, ProxyFailure) and is_proxy_error(cause):
+                    metrics.inc("proxy_errors", label=proxy)
+                    raise ProxyFailure(f"Proxy connection failed for roll {roll}: {cause}") from cause
+                raise
+    proxy_pool.report(proxy, True, latency)
+    controller.on_success(latency, proxy)
+    return content
 
-def process_roll(roll, index, total, start_time):
+async def process_roll_async(session, exam, roll, attempt):
     if stop_event.is_set():
         return None
-    
+
     try:
-        now = time.time()
-        elapsed = now - start_time
-        processed_count = index
-        rate = processed_count / elapsed if elapsed > 0 else 0
-        remaining = total - processed_count
-        eta_seconds = int(remaining / rate) if rate > 0 else 0
-        eta_str = str(timedelta(seconds=eta_seconds)).split('.')[0]
-
-        print(f"[{index}/{total}] Fetching roll: {roll} | Rate: {rate:.2f}/sec | ETA: {eta_str}")
-
-        headers = {
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Cache-Control': 'max-age=0',
-            'Connection': 'keep-alive',
-            'Content-Type': 'application/x-www-form-urlencoded',
-            'Origin': 'http://ntrca.teletalk.com.bd',
-            'Referer': 'http://ntrca.teletalk.com.bd/result/index.php',
-            'Upgrade-Insecure-Requests': '1',
-            'User-Agent': UserAgent().random,
-        }
-
-        data = {
-            'rollno': roll,
-            'exam': '18:18th:2023:3',
-            'yes': 'YES',
-            'button2': 'Submit',
-        }
-
-        response = fetch_result(roll, headers, data, proxies)
-
-        doc = html.fromstring(response.content)
-        result_status = doc.xpath('//span[@class="red12bold"]/text()')
-
-        result_data = {
-            'roll': roll,
-            'status': None,
-            'position': None,
-            'subject': None,
-            'personal_details': {}
-        }
-
-        if result_status and result_status[0] == 'CONGRATULATIONS, PASSED THE FINAL EXAM':
-            result_data['status'] = 'PASSED'
-            td = doc.xpath('//span[@class="red12bold"]/parent::td')[0]
-
-            position = td.xpath('./span[@class="black12bold"][2]/text()')[0]
-            result_data['position'] = position.strip()
-
-            subject = td.xpath('./span[@class="black12bold"][3]/text()')[0]
-            result_data['subject'] = subject.strip()
-
-            personal_details = td.xpath('./text()')
-            cleaned_details = [line.strip() for line in personal_details if line.strip()]
-            details_dict = {}
-
-            for line in cleaned_details:
-                if ':' in line:
-                    key, value = line.split(':', 1)
-                    if key == 'Roll':
+        content = await fetch_result_async(session, roll, exam.form_body(roll))
+        return record_result(exam, roll, content)
+
+    except Exception as e:
+        return handle_failure(exam, roll, attempt, e)
+
+def record_connect(seconds):
+    """Count a new connection and the time it took to set up"""
+    metrics.observe("connect_time", seconds)
+    metrics.inc("connections_opened")
+
+def connection_trace():
+    """aiohttp hooks recording new-connection time and keep-alive reuse"""
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_create_start(session, context, params):
+        context.connect_start = time.monotonic()
+
+    async def on_create_end(session, context, params):
+        record_connect(time.monotonic() - context.connect_start)
+
+    async def on_reuse(session, context, params):
+        metrics.inc("connections_reused")
+
+    trace_config.on_connection_create_start.append(on_create_start)
+    trace_config.on_connection_create_end.append(on_create_end)
+    trace_config.on_connection_reuseconn.append(on_reuse)
+    return trace_config
+
+async def run_async(work, total, concurrency, pool_size):
+    """Fetch all (exam, roll) items on one event loop with a bounded keep-alive pool per proxy.
+
+    `concurrency` worker coroutines pull from a shared iterator, so no per-roll
+    task is created up front; the controller decides how many of them may have
+    a request in flight at any moment. Due retries are taken before new rolls.
+    """
+    active = 0
+
+    # aiohttp keys pooled connections by proxy, so limit_per_host caps each proxy's pool
+    connector = aiohttp.TCPConnector(limit=pool_size * len(proxy_pool), limit_per_host=pool_size, ssl=False, keepalive_timeout=30)
+    async with aiohttp.ClientSession(connector=connector, trace_configs=[connection_trace()]) as session:
+        async def worker():
+            nonlocal active
+            while not stop_event.is_set():
+                due = pop_due_retries(limit=1)
+                if due:
+                    exam, roll, attempt = due[0]
+                else:
+                    item = next(work, None)
+                    if item is None:
+                        wait_for = next_retry_in()
+                        if wait_for is None and active == 0:
+                            break
+                        await asyncio.sleep(min(wait_for if wait_for is not None else 0.5, 0.5))
                         continue
-                    details_dict[key.strip()] = value.strip()
+                    (exam, roll), attempt = item, 0
 
-            result_data['personal_details'] = details_dict
-        else:
-            assert result_status[0] == 'SORRY! YOU ARE NOT QUALIFIED!'
-            result_data['status'] = 'FAILED'
+                active += 1
+                try:
+                    await process_roll_async(session, exam, roll, attempt)
+                finally:
+                    active -= 1
 
-        result_queue.put(result_data)
-        return result_data
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
 
-    except Exception as e:
-        print(f"❌ Error processing roll {roll}: {str(e)}")
-        error_data = {
-            'roll': roll,
-            'status': 'ERROR',
-            'error': str(e)
-        }
-        result_queue.put(error_data)
-        return error_data
-
-def save_results_worker(filename="all_results.json"):
-    """Separate thread that handles all file saving operations"""
-    temp_filename = filename + ".tmp"
-    backup_filename = filename + ".bak"
-    
+def run_threaded(work, concurrency, window=None):
+    """Fetch (exam, roll) items on a thread pool, keeping at most `window` futures alive.
+
+    The iterator is only advanced as futures complete, so memory stays flat
+    however many rolls there are; due retries are submitted before new rolls.
+    """
+    window = window or concurrency * 2
+    work = iter(work)
+    exhausted = False
+    futures = set()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while not stop_event.is_set():
+            for exam, roll, attempt in pop_due_retries(limit=window - len(futures)):
+                futures.add(executor.submit(process_roll, exam, roll, attempt))
+            while not exhausted and len(futures) < window:
+                item = next(work, None)
+                if item is None:
+                    exhausted = True
+                    break
+                exam, roll = item
+                futures.add(executor.submit(process_roll, exam, roll, 0))
+
+            if not futures:
+                if exhausted and not pending_retries():
+                    break
+                time.sleep(min(next_retry_in() or 0, 1))
+                continue
+
+            done, futures = wait(futures, timeout=1, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"❌ Error in future: {e}")
+
+def run_work(work, total, args, concurrency):
+    if args.use_async:
+        asyncio.run(run_async(work, total, concurrency, args.pool_size))
+    else:
+        run_threaded(work, concurrency, args.window)
+
+def load_roll_list(filename):
+    """Rolls from a JSON list or a plain text file with one roll per line"""
+    with open(filename, 'r') as f:
+        text = f.read()
+    if text.lstrip().startswith('['):
+        return [str(roll) for roll in json.loads(text)]
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+def prioritize(rolls, first_rolls=(), prefixes=(), viva_order=None):
+    """Order rolls for fetching.
+
+    Rolls listed in `first_rolls` come first in the given order, then rolls
+    matching each of `prefixes` in turn, then the rest. Within each group rolls
+    keep viva date order when `viva_order` is given, roll order otherwise.
+    """
+    first = {roll: i for i, roll in enumerate(first_rolls)}
+    viva = {roll: i for i, roll in enumerate(viva_order)} if viva_order else {}
+    unscheduled = len(viva)
+
+    def key(roll):
+        if roll in first:
+            return (0, first[roll], roll)
+        group = len(prefixes) + 1
+        for i, prefix in enumerate(prefixes):
+            if roll.startswith(prefix):
+                group = i + 1
+                break
+        return (group, viva.get(roll, unscheduled), roll)
+
+    return sorted(rolls, key=key)
+
+def run_leases(work_queue, worker_id, done_elsewhere, args, concurrency, priorities=None):
+    """Claim roll ranges from the work queue and fetch them until none is left.
+
+    A range is marked done once all its rolls are saved or dead-lettered; on a
+    stop it is handed back so another worker can take it over straight away.
+    """
+    shards = {exam.name: exam for exam in exams}
+    while not stop_event.is_set():
+        lease = work_queue.claim(worker_id)
+        if lease is None:
+            print("✅ No ranges left to claim")
+            return
+        exam = shards.get(lease.exam)
+        if exam is None:
+            # Left to expire so that a worker with this exam picks it up
+            print(f"⚠️ Range {lease.range_id} is for exam {lease.exam}, which this worker does not have")
+            continue
+
+        done = exam.store.processed_rolls() | done_elsewhere[exam.name]
+        rolls = [roll for roll in lease.rolls if roll not in done]
+        if priorities:
+            rolls = prioritize(rolls, *priorities)
+        print(f"📋 Claimed range {lease.range_id} of {exam.name}: {len(rolls)}/{len(lease.rolls)} rolls to fetch")
+        try:
+            with LeaseKeeper(work_queue, lease) as keeper:
+                run_work(((exam, roll) for roll in rolls), len(rolls), args, concurrency)
+        except BaseException:
+            work_queue.release(lease)
+            raise
+        if stop_event.is_set():
+            work_queue.release(lease)
+            return
+        if not keeper.lost:
+            work_queue.complete(lease)
+
+def save_results_worker():
+    """Separate thread that appends finished results to each exam's store in batches"""
     while not stop_event.is_set() or not result_queue.empty():
         try:
             results_to_save = []
@@ -153,110 +411,141 @@ def save_results_worker(filename="all_results.json"):
                 except queue.Empty:
                     break
             
+            metrics.set("queue_depth", result_queue.qsize())
             if not results_to_save:
                 time.sleep(1)
                 continue
-                
-            existing_results = []
-            if os.path.exists(filename):
-                with save_lock:
-                    try:
-                        with open(filename, 'r', encoding='utf-8') as f:
-                            existing_results = json.load(f)
-                    except (json.JSONDecodeError, IOError) as e:
-                        print(f"⚠️ Error reading existing results: {e}")
-                        if os.path.exists(backup_filename):
-                            try:
-                                with open(backup_filename, 'r', encoding='utf-8') as f:
-                                    existing_results = json.load(f)
-                            except Exception as e:
-                                print(f"⚠️ Error reading backup: {e}")
-                                existing_results = []
-            
-            roll_to_index = {r['roll']: i for i, r in enumerate(existing_results)}
-            for new_result in results_to_save:
-                if new_result['roll'] in roll_to_index:
-                    existing_results[roll_to_index[new_result['roll']]] = new_result
-                else:
-                    existing_results.append(new_result)
-            
-            with save_lock:
-                try:
-                    if os.path.exists(filename):
-                        os.replace(filename, backup_filename)
-                    
-                    with open(temp_filename, 'w', encoding='utf-8') as f:
-                        json.dump(existing_results, f, ensure_ascii=False, indent=4)
-                    
-                    os.replace(temp_filename, filename)
-                    print(f"💾 Saved {len(results_to_save)} results (total: {len(existing_results)})")
-                    
-                except Exception as e:
-                    print(f"❌ Error saving results: {e}")
-                    if os.path.exists(backup_filename):
-                        try:
-                            os.replace(backup_filename, filename)
-                        except Exception as e:
-                            print(f"❌ Error restoring backup: {e}")
+
+            by_exam = {}
+            for exam, result in results_to_save:
+                by_exam.setdefault(exam, []).append(result)
+            with metrics.timer("save_time"):
+                for exam, results in by_exam.items():
+                    exam.store.extend(results)
+                    exam.store.sync()
+            metrics.inc("saved", len(results_to_save))
             
         except Exception as e:
             print(f"❌ Unexpected error in save worker: {e}")
             time.sleep(5)
 
 def main():
+    parser = argparse.ArgumentParser(description="Scrape NTRCA final results for all roll numbers.")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Fetch on a single asyncio event loop instead of a thread pool")
+    parser.add_argument("--concurrency", type=int, help="Upper bound for in-flight requests (default: 100 threads, 1000 in async mode)")
+    parser.add_argument("--initial-concurrency", type=int, default=20, help="In-flight limit the adaptive controller starts from (default: 20)")
+    parser.add_argument("--latency-target", type=float, default=5.0, help="Average latency in seconds above which the limit is cut (default: 5)")
+    parser.add_argument("--failure-threshold", type=float, default=0.2, help="Share of the last 100 responses that must fail (timeouts, empty bodies, 5xx) before the limit is cut; increases hold above half of it (default: 0.2)")
+    parser.add_argument("--no-adaptive", action="store_true", help="Keep the in-flight limit fixed at --concurrency")
+    parser.add_argument("--max-attempts", type=int, default=10, help="Attempts per roll before it goes to the dead-letter list (default: 10)")
+    parser.add_argument("--retry-failed", action="store_true", help=f"Only re-run the rolls in {DEAD_LETTERS_FILE}")
+    parser.add_argument("--pool-size", type=int, default=100, help="Keep-alive connections per proxy in async mode (default: 100)")
+    parser.add_argument("--status-interval", type=float, default=5.0, help="Seconds between status lines (default: 5)")
+    parser.add_argument("--metrics-file", help=f"Where the metrics snapshot is written (default: {METRICS_FILE}; with --queue, in the worker's shard directory of the first exam)")
+    parser.add_argument("--exam", default=DEFAULT_EXAM, help=f"Exam id sent with the form (default: {DEFAULT_EXAM})")
+    parser.add_argument("--manifest", help="JSON list of exams to scrape together, each with its own roll list and result directory")
+    parser.add_argument("--window", type=int, help="Most rolls submitted to the thread pool at once (default: twice --concurrency)")
+    parser.add_argument("--first-rolls", help="File of rolls to fetch before all others (JSON list or one per line)")
+    parser.add_argument("--priority-prefix", nargs="+", default=[], metavar="PREFIX", help="Fetch rolls starting with these prefixes (e.g. subject codes) first, in the order given")
+    parser.add_argument("--viva-order", action="store_true", help="Fetch rolls in viva date order from the schedule index (extract_rolls.py)")
+    parser.add_argument("--archive", action="store_true", help="Keep every raw page in a compressed archive for offline re-parsing (raw_archive.py)")
+    parser.add_argument("--queue", nargs="?", const=QUEUE_FILE, help=f"Work as one of several workers on a shared work queue (default file: {QUEUE_FILE})")
+    parser.add_argument("--worker-id", help="Name of this worker and its shard directory (default: host-pid)")
+    parser.add_argument("--lease-seconds", type=float, default=300, help="How long a claimed range stays reserved without renewal (default: 300)")
+    args = parser.parse_args()
+
+    if args.queue and args.retry_failed:
+        # Dead letters stay in each worker's shard; re-seeding after a merge queues them again
+        parser.error("--retry-failed does not apply to --queue: merge the shards, then re-seed with work_queue.py seed --reseed")
+
+    if args.use_async and aiohttp is None:
+        print("❌ Async mode requires aiohttp (pip install aiohttp)")
+        return
+
+    global controller, transport, exams
+    concurrency = args.concurrency or (1000 if args.use_async else 100)
+    controller = AIMDController(
+        initial=args.initial_concurrency,
+        max_limit=concurrency,
+        latency_target=args.latency_target,
+        adaptive=not args.no_adaptive,
+        failure_threshold=args.failure_threshold,
+        # With a single proxy there is nothing to tell its faults from the server's
+        min_failing_proxies=min(2, len(proxy_pool))
+    )
+    transport = Transport(pool_connections=len(proxy_pool), on_connect=record_connect)
+
     try:
-        with open("all_rolls.json", "r") as f:
-            all_rolls = json.load(f)
+        exams = load_manifest(args.manifest) if args.manifest else [Exam(args.exam)]
     except Exception as e:
-        print(f"❌ Failed to load roll numbers: {e}")
+        print(f"❌ Failed to load exam manifest: {e}")
         return
 
-    results_file = "all_results.json"
-    if not os.path.exists(results_file):
-        with open(results_file, 'w', encoding='utf-8') as f:
-            json.dump([], f, ensure_ascii=False, indent=4)
-
-    processed_rolls = set()
     try:
-        with open(results_file, "r", encoding="utf-8") as f:
-            existing_results = json.load(f)
-            processed_rolls = {r['roll'] for r in existing_results}
+        first_rolls = load_roll_list(args.first_rolls) if args.first_rolls else []
+        viva_order = None
+        if args.viva_order:
+            with ScheduleIndex() as index:
+                viva_order = index.rolls_by_viva_date()
     except Exception as e:
-        print(f"⚠️ Error reading existing results: {e}")
+        print(f"❌ Failed to load priorities: {e}")
+        return
+    priorities = None
+    if first_rolls or args.priority_prefix or viva_order:
+        priorities = (first_rolls, args.priority_prefix, viva_order)
 
-    remaining_rolls = sorted(set(all_rolls) - processed_rolls)
-    total = len(remaining_rolls)
+    work_queue = None
+    if args.queue:
+        work_queue = WorkQueue(args.queue, args.lease_seconds)
+        worker_id = args.worker_id or default_worker_id()
+        done_elsewhere = {exam.name: canonical_rolls(exam) for exam in exams}
+        exams = [shard_exam(exam, worker_id) for exam in exams]
+        for exam in exams:
+            exam.open(args.max_attempts, args.archive)
+        # Workers sharing a filesystem must not overwrite each other's metrics
+        metrics_file = args.metrics_file or exams[0].path(METRICS_FILE)
+        total = work_queue.remaining()
+        print(f"👷 Worker {worker_id} | {total} rolls left in {args.queue}")
+    else:
+        metrics_file = args.metrics_file or METRICS_FILE
+        work = {}
+        try:
+            for exam in exams:
+                exam.open(args.max_attempts, args.archive)
+                work[exam] = exam.remaining_rolls(args.retry_failed)
+                if priorities:
+                    work[exam] = prioritize(work[exam], *priorities)
+        except Exception as e:
+            print(f"❌ Failed to load roll numbers: {e}")
+            for exam in exams:
+                if exam.store:
+                    exam.close()
+            return
+        total = sum(len(rolls) for rolls in work.values())
 
+    if len(exams) > 1 and not work_queue:
+        for exam, rolls in work.items():
+            print(f"📋 {exam.name} ({exam.exam_id}): {len(rolls)} rolls -> {exam.directory}")
     print(f"Total rolls to process: {total}")
-    if not remaining_rolls:
+    if not total:
         print("✅ All rolls already processed!")
+        for exam in exams:
+            exam.close()
+        if work_queue:
+            work_queue.close()
         return
     saver_thread = threading.Thread(
         target=save_results_worker,
-        args=(results_file,),
         daemon=True
     )
     saver_thread.start()
-
-    start_time = time.time()
+    reporter = StatusReporter(metrics, total, args.status_interval, controller.status, metrics_file).start()
 
     try:
-        with ThreadPoolExecutor(max_workers=100) as executor:
-            futures = {
-                executor.submit(process_roll, roll, idx, total, start_time): roll
-                for idx, roll in enumerate(remaining_rolls, start=1)
-            }
-            for future in as_completed(futures):
-                if stop_event.is_set():
-                    break
-                
-                try:
-                    result = future.result()
-                    if result:
-                        status = result.get('status', 'UNKNOWN')
-                        print(f"ℹ️ Processed roll {result['roll']} - Status: {status}")
-                except Exception as e:
-                    print(f"❌ Error in future: {e}")
+        if work_queue:
+            run_leases(work_queue, worker_id, done_elsewhere, args, concurrency, priorities)
+        else:
+            run_work(interleave(work), total, args, concurrency)
 
     except KeyboardInterrupt:
         print("\n⏸️ Ctrl+C detected! Stopping gracefully...")
@@ -277,6 +566,17 @@ def main():
     finally:
         stop_event.set()
         saver_thread.join(timeout=10)
+        reporter.stop()
+        for exam in exams:
+            exam.close()
+        if work_queue:
+            work_queue.close()
+        transport.close()
+        for health in proxy_pool.summary():
+            print(f"🔌 {health['proxy']} | Requests: {health['requests']} | Failures: {health['failures']} | Latency: {health['latency']}s | Ejected: {health['ejected']}")
+        for exam in exams:
+            exported = exam.export_json()
+            print(f"💾 Exported {exported} results to {exam.store.legacy_json}")
         print("🎉 Processing completed!")
 
 if __name__ == "__main__":
@@ -0,0 +1,195 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Runtime metrics for the scrapers. Counters (optionally split by
+# a label such as the proxy) and fixed-bucket latency histograms are updated
+# under one short lock, so recording costs a few dict operations per request.
+# A background reporter prints a single status line every few seconds with the
+# rate and ETA and writes a machine-readable snapshot to metrics.json.
+# ------------------------------------------------------------------------------
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+METRICS_FILE = "metrics.json"
+
+# Histogram upper bounds in seconds, roughly logarithmic from 1ms to 60s
+BUCKETS = (
+    0.001, 0.002, 0.003, 0.005, 0.0075, 0.01, 0.015, 0.02, 0.03, 0.05, 0.075,
+    0.1, 0.15, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0,
+    30.0, 60.0, float('inf'),
+)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction):
+        """Estimate, interpolating linearly inside the bucket that holds the rank"""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                upper = min(bound, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 4) if self.count else 0.0,
+            'p50': round(self.percentile(0.50), 4),
+            'p90': round(self.percentile(0.90), 4),
+            'p99': round(self.percentile(0.99), 4),
+            'max': round(self.max, 4),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.counters = {}
+        self.labelled = {}
+        self.histograms = {}
+        self.gauges = {}
+
+    def inc(self, name, value=1, label=None):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            if label is not None:
+                by_label = self.labelled.setdefault(name, {})
+                by_label[label] = by_label.get(label, 0) + value
+
+    def observe(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def set(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    @contextmanager
+    def timer(self, name):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start)
+
+    def count(self, name):
+        with self.lock:
+            return self.counters.get(name, 0)
+
+    def percentile(self, name, fraction):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            return histogram.percentile(fraction) if histogram else 0.0
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'elapsed': round(time.monotonic() - self.started, 3),
+                'counters': dict(self.counters),
+                'by_label': {name: dict(values) for name, values in self.labelled.items()},
+                'gauges': dict(self.gauges),
+                'histograms': {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+            }
+
+    def save(self, filename=METRICS_FILE, **extra):
+        snapshot = self.snapshot()
+        snapshot.update(extra)
+        temp_filename = filename + ".tmp"
+        with open(temp_filename, 'w') as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(temp_filename, filename)
+
+
+def format_eta(seconds):
+    return str(timedelta(seconds=int(seconds))).split('.')[0]
+
+
+class StatusReporter:
+    """Print one status line and save the metrics file every `interval` seconds.
+
+    Progress is the 'completed' counter against `total`; `extra` is an optional
+    callable whose string is appended to the line (e.g. the concurrency limit).
+    """
+
+    def __init__(self, metrics, total, interval=5.0, extra=None, filename=METRICS_FILE):
+        self.metrics = metrics
+        self.total = total
+        self.interval = interval
+        self.extra = extra
+        self.filename = filename
+        self.stopped = threading.Event()
+        self.thread = None
+        self.started = self.last_time = time.monotonic()
+        self.last_completed = 0
+
+    def start(self):
+        self.started = self.last_time = time.monotonic()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join(timeout=self.interval + 1)
+        self.report()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.report()
+
+    def status_line(self):
+        now = time.monotonic()
+        completed = self.metrics.count('completed')
+        elapsed = now - self.started
+        rate = completed / elapsed if elapsed > 0 else 0.0
+        recent = (completed - self.last_completed) / (now - self.last_time) if now > self.last_time else 0.0
+        self.last_completed, self.last_time = completed, now
+        remaining = max(self.total - completed, 0)
+        eta = format_eta(remaining / rate) if rate > 0 else '--:--:--'
+        line = (
+            f"📊 [{completed}/{self.total}] {rate:.1f}/s (now {recent:.1f}/s) | ETA: {eta}"
+            f" | Errors: {self.metrics.count('errors')} | Retries: {self.metrics.count('retries')}"
+            f" | p50: {self.metrics.percentile('request_time', 0.5) * 1000:.0f}ms"
+        )
+        if self.extra:
+            line += f" | {self.extra()}"
+        return line
+
+    def report(self):
+        print(self.status_line(), flush=True)
+        try:
+            self.metrics.save(self.filename, total=self.total)
+        except OSError as e:
+            print(f"⚠️ Could not write {self.filename}: {e}")
@@ -0,0 +1,314 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Local stand-in for the Teletalk result server, for load tests
+# and benchmark.py. POSTs to result/index.php get PASSED/FAILED pages built
+# from fixtures/ with the requested roll filled in, after a tunable latency.
+# Empty bodies, server errors and an overload limit (requests beyond it get an
+# empty body, like the real server) can be injected. Extra ports act as HTTP
+# proxies, some of which can be made to fail, and every port also answers
+# absolute-form proxy requests and httpbin-style /ip probes, so proxy.txt can
+# point straight at it. GET /__stats and /__reset expose server-side counters
+# and latency percentiles. With --live-ranges only rolls inside the given
+# ranges have a result; others get the form page back without one, which is
+# what discover_rolls.py probes for.
+#
+# Usage: python mock_server.py [--port 8765] [--proxies 4] [--latency 0.05]
+#                              [--empty-rate 0.01] [--error-rate 0.01]
+#                              [--max-connections 200] [--proxy-file proxy.txt]
+#                              [--live-ranges 101000001-101004000 ...]
+# ------------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+FIXTURE_ROLLS = {'result_passed.html': '201000123', 'result_failed.html': '201000124'}
+FIXTURE_POSITION = 'Ebtedaye Teacher (General)'
+FIXTURE_SUBJECT = 'Language (Bengali &amp; English)'
+
+POSITIONS = [
+    'Ebtedaye Teacher (General)',
+    'Assistant Teacher',
+    'Lecturer',
+    'Assistant Moulovi',
+]
+
+
+def load_template(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read().replace(FIXTURE_ROLLS[name], '{roll}')
+
+
+PASSED_TEMPLATE = load_template('result_passed.html') \
+    .replace(FIXTURE_POSITION, '{position}') \
+    .replace(FIXTURE_SUBJECT, '{subject}')
+FAILED_TEMPLATE = load_template('result_failed.html')
+with open(os.path.join(FIXTURES_DIR, 'result_malformed.html'), 'r', encoding='utf-8') as f:
+    NOT_FOUND_PAGE = f.read().replace('Too many requests. Please try again later.', 'No result found.')
+
+
+def result_page(roll, pass_rate):
+    """Deterministic ('passed' | 'failed', page) for a roll; the subject code picks position and subject"""
+    code = roll[:3]
+    if zlib.crc32(roll.encode()) % 1000 >= pass_rate * 1000:
+        return 'failed', FAILED_TEMPLATE.format(roll=roll)
+    position = POSITIONS[int(code) % len(POSITIONS)] if code.isdigit() else POSITIONS[0]
+    return 'passed', PASSED_TEMPLATE.format(roll=roll, position=position, subject=f'Subject {code}')
+
+
+def parse_range(text):
+    """'101000001-101004000' -> (101000001, 101004000)"""
+    first, sep, last = text.partition('-')
+    if not sep or not first.isdigit() or not last.isdigit() or int(first) > int(last):
+        raise argparse.ArgumentTypeError(f"expected FIRST-LAST roll numbers, got {text!r}")
+    return int(first), int(last)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+class MockState:
+    """Behaviour settings and counters shared by every port of one mock server"""
+
+    def __init__(self, latency=0.05, jitter=0.02, empty_rate=0.0, error_rate=0.0,
+                 max_connections=0, pass_rate=0.3, proxy_latency=0.0, seed=None,
+                 live_ranges=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.empty_rate = empty_rate
+        self.error_rate = error_rate
+        self.max_connections = max_connections
+        self.pass_rate = pass_rate
+        self.proxy_latency = proxy_latency
+        self.live_ranges = live_ranges
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.active = 0
+            self.peak_active = 0
+            self.counts = {}
+            self.latencies = []
+            self.started = time.monotonic()
+
+    def enter(self):
+        with self.lock:
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            return self.active
+
+    def leave(self, outcome, elapsed):
+        with self.lock:
+            self.active -= 1
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+            self.latencies.append(elapsed)
+
+    def draw(self):
+        """Random latency and fault roll for one request"""
+        with self.lock:
+            delay = max(0.0, self.random.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+            return delay, self.random.random()
+
+    def exists(self, roll):
+        """Whether a roll has a result; every roll does without live ranges"""
+        if self.live_ranges is None:
+            return True
+        number = int(roll) if roll.isdigit() else -1
+        return any(first <= number <= last for first, last in self.live_ranges)
+
+    def snapshot(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            elapsed = time.monotonic() - self.started
+            return {
+                'requests': len(latencies),
+                'elapsed': round(elapsed, 3),
+                'counts': dict(self.counts),
+                'active': self.active,
+                'peak_active': self.peak_active,
+                'p50': round(percentile(latencies, 0.50), 4),
+                'p90': round(percentile(latencies, 0.90), 4),
+                'p99': round(percentile(latencies, 0.99), 4),
+                'max': round(latencies[-1], 4) if latencies else 0.0,
+            }
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; with Nagle on, a kept-alive
+    # connection waits on the client's delayed ACK between them
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, status=200, content_type='text/html; charset=utf-8'):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_json(self, data, status=200):
+        self.send_body(json.dumps(data), status, 'application/json')
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length) if length else b''
+
+    @property
+    def proxied(self):
+        # Proxies are sent absolute-form request targets (http://host/path)
+        return self.path.startswith('http://')
+
+    def through_proxy(self):
+        """Apply this port's proxy behaviour; returns False if the request was answered"""
+        if not self.proxied:
+            return True
+        if self.server.dead:
+            self.send_body('Bad Gateway', 502, 'text/plain')
+            return False
+        if self.server.state.proxy_latency:
+            time.sleep(self.server.state.proxy_latency)
+        return True
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/__stats':
+            self.send_json(self.server.state.snapshot())
+        elif path == '/__reset':
+            self.server.state.reset()
+            self.send_json({'reset': True})
+        elif path == '/ip':
+            if self.through_proxy():
+                self.send_json({'origin': self.client_address[0]})
+        else:
+            self.send_body('Not Found', 404, 'text/plain')
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        body = self.read_body()
+        if not path.endswith('index.php'):
+            self.send_body('Not Found', 404, 'text/plain')
+            return
+        if not self.through_proxy():
+            return
+
+        state = self.server.state
+        start = time.monotonic()
+        active = state.enter()
+        outcome = 'error'
+        try:
+            roll = parse_qs(body.decode('utf-8', 'replace')).get('rollno', [''])[0]
+            delay, fault = state.draw()
+            time.sleep(delay)
+            if state.max_connections and active > state.max_connections:
+                outcome = 'overloaded'
+                self.send_body('')
+            elif fault < state.error_rate:
+                outcome = 'error'
+                self.send_body('Service Unavailable', 503, 'text/plain')
+            elif fault < state.error_rate + state.empty_rate:
+                outcome = 'empty'
+                self.send_body('')
+            elif not roll:
+                outcome = 'bad_request'
+                self.send_body('Roll number is required', 400, 'text/plain')
+            elif not state.exists(roll):
+                outcome = 'not_found'
+                self.send_body(NOT_FOUND_PAGE)
+            else:
+                outcome, page = result_page(roll, state.pass_rate)
+                self.send_body(page)
+        finally:
+            state.leave(outcome, time.monotonic() - start)
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, state, dead=False):
+        super().__init__(address, MockHandler)
+        self.state = state
+        self.dead = dead
+
+
+def start_servers(state, host='127.0.0.1', port=8765, proxies=0, dead_proxies=0):
+    """Start the origin on `port` and `proxies` proxy ports after it, each in a thread.
+
+    Returns (servers, proxy_urls). With no proxy ports the origin itself is the
+    only proxy URL, since it answers absolute-form requests too.
+    """
+    servers = [MockServer((host, port), state)]
+    for i in range(proxies):
+        servers.append(MockServer((host, port + 1 + i), state, dead=i < dead_proxies))
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    proxy_servers = servers[1:] or servers
+    proxy_urls = [f'http://{host}:{server.server_address[1]}' for server in proxy_servers]
+    return servers, proxy_urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the Teletalk result server.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Origin port; proxy ports follow it (default: 8765)")
+    parser.add_argument("--proxies", type=int, default=0, help="Number of mock proxy ports (default: 0, the origin acts as the proxy)")
+    parser.add_argument("--dead-proxies", type=int, default=0, help="How many of the proxy ports answer 502 (default: 0)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean response latency in seconds (default: 0.05)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Standard deviation of the latency (default: 0.02)")
+    parser.add_argument("--proxy-latency", type=float, default=0.0, help="Extra latency added by each proxy hop (default: 0)")
+    parser.add_argument("--empty-rate", type=float, default=0.0, help="Fraction of responses with an empty body (default: 0)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses (default: 0)")
+    parser.add_argument("--max-connections", type=int, default=0, help="Concurrent requests beyond this get an empty body (default: 0, unlimited)")
+    parser.add_argument("--pass-rate", type=float, default=0.3, help="Fraction of rolls that passed (default: 0.3)")
+    parser.add_argument("--live-ranges", nargs="+", type=parse_range, metavar="FIRST-LAST", help="Only rolls in these inclusive ranges have a result (default: every roll)")
+    parser.add_argument("--seed", type=int, help="Seed for the latency and fault draws")
+    parser.add_argument("--proxy-file", help="Write the proxy URLs to this file, e.g. proxy.txt")
+    args = parser.parse_args()
+
+    state = MockState(
+        latency=args.latency, jitter=args.jitter, empty_rate=args.empty_rate,
+        error_rate=args.error_rate, max_connections=args.max_connections,
+        pass_rate=args.pass_rate, proxy_latency=args.proxy_latency, seed=args.seed,
+        live_ranges=args.live_ranges,
+    )
+    servers, proxy_urls = start_servers(state, args.host, args.port, args.proxies, args.dead_proxies)
+    if args.proxy_file:
+        with open(args.proxy_file, 'w') as f:
+            f.write('\n'.join(proxy_urls) + '\n')
+    print(f"🔌 Mock result server on http://{args.host}:{args.port}/result/index.php")
+    for url in proxy_urls:
+        print(f"🔌 Proxy: {url}")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+        print(json.dumps(state.snapshot()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Health-scored proxy pool shared by the scrapers. Every request
+# picks a proxy weighted towards the fastest, most reliable ones; proxies that
+# keep failing are ejected for a cool-down and re-probed with a single request
+# before they get traffic again.
+# ------------------------------------------------------------------------------
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+# Answered by the proxy itself (bad gateway, proxy authentication), not the server
+PROXY_STATUS_CODES = (407, 502)
+
+
+class ProxyState:
+    def __init__(self, proxy, initial_latency):
+        self.proxy = proxy
+        self.latency = initial_latency
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.probing = False
+
+    def score(self):
+        return max(1.0 - self.error_rate, 0.05) / max(self.latency, 0.01)
+
+
+class ProxyPool:
+    def __init__(self, proxies, eject_after=5, cooldown=30, max_cooldown=600, alpha=0.2, initial_latency=1.0):
+        if not proxies:
+            raise ValueError("Proxy pool needs at least one proxy")
+        self.states = {proxy: ProxyState(proxy, initial_latency) for proxy in proxies}
+        self.eject_after = eject_after
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.alpha = alpha
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, filename='proxy.txt', **kwargs):
+        with open(filename) as f:
+            proxy_list = [line.strip() for line in f if line.strip()]
+        return cls(proxy_list, **kwargs)
+
+    def __len__(self):
+        return len(self.states)
+
+    def proxies(self):
+        return list(self.states)
+
+    def acquire(self):
+        """Pick a proxy for one request, weighted by its health score.
+
+        An ejected proxy whose cool-down has passed is handed out to exactly one
+        caller as a probe; if every proxy is ejected the one that comes back
+        soonest is used rather than blocking the caller. Prefer checkout(),
+        which frees the probe again if the request never reports back.
+        """
+        return self._pick()[0]
+
+    @contextmanager
+    def checkout(self):
+        """acquire() for the duration of one request"""
+        proxy, probe = self._pick()
+        try:
+            yield proxy
+        finally:
+            if probe:
+                # A probe cancelled or failed before report() would otherwise
+                # keep its proxy marked as being probed, and never probed again
+                with self.lock:
+                    self.states[proxy].probing = False
+
+    def _pick(self):
+        """(proxy, whether this is the proxy's probe)"""
+        now = time.monotonic()
+        with self.lock:
+            for state in self.states.values():
+                if state.ejected_until and not state.probing and state.ejected_until <= now:
+                    state.probing = True
+                    return state.proxy, True
+
+            healthy = [state for state in self.states.values() if not state.ejected_until]
+            if not healthy:
+                return min(self.states.values(), key=lambda s: s.ejected_until).proxy, False
+
+            weights = [state.score() for state in healthy]
+            return random.choices(healthy, weights=weights)[0].proxy, False
+
+    def next_available_in(self):
+        """Seconds until a proxy can take a request: 0 while any is healthy, else until the next probe"""
+        now = time.monotonic()
+        with self.lock:
+            if any(not state.ejected_until for state in self.states.values()):
+                return 0.0
+            return max(0.0, min(state.ejected_until for state in self.states.values()) - now)
+
+    def report(self, proxy, ok, latency=None):
+        """Record the outcome of a request made through `proxy`"""
+        now = time.monotonic()
+        with self.lock:
+            state = self.states.get(proxy)
+            if state is None:
+                return
+            state.requests += 1
+            state.error_rate += self.alpha * ((0.0 if ok else 1.0) - state.error_rate)
+            if ok:
+                if latency is not None:
+                    state.latency += self.alpha * (latency - state.latency)
+                state.consecutive_failures = 0
+                if state.ejected_until:
+                    print(f"🔌 Proxy {proxy} recovered")
+                state.ejected_until = 0.0
+                state.ejections = 0
+                state.probing = False
+                return
+
+            state.failures += 1
+            state.consecutive_failures += 1
+            # Requests that were already in flight when the proxy got ejected
+            # must not extend its cool-down; only a failed probe does that.
+            if state.ejected_until and not state.probing:
+                return
+            if state.probing or state.consecutive_failures >= self.eject_after:
+                self._eject_locked(state, now)
+
+    def eject(self, proxy):
+        with self.lock:
+            self._eject_locked(self.states[proxy], time.monotonic())
+
+    def _eject_locked(self, state, now):
+        state.ejections += 1
+        cooldown = min(self.cooldown * 2 ** (state.ejections - 1), self.max_cooldown)
+        state.ejected_until = now + cooldown
+        state.probing = False
+        print(f"🚫 Proxy {state.proxy} ejected for {cooldown:.0f}s after {state.consecutive_failures} consecutive failures")
+
+    def probe_all(self, url='http://httpbin.org/ip', timeout=10):
+        """Check every proxy once; raises if none of them works"""
+        working = 0
+        for proxy in self.proxies():
+            start = time.monotonic()
+            try:
+                response = requests.get(url, proxies=self.as_requests(proxy), timeout=timeout)
+                response.raise_for_status()
+                self.report(proxy, True, time.monotonic() - start)
+                working += 1
+            except Exception as e:
+                print(f"⚠️ Proxy test failed for {proxy}: {e}")
+                self.report(proxy, False)
+                self.eject(proxy)
+        if not working:
+            raise Exception("Proxy test failed: no working proxy")
+        print(f"🔌 {working}/{len(self)} proxies passed the probe")
+        return working
+
+    def summary(self):
+        with self.lock:
+            return [
+                {
+                    'proxy': state.proxy,
+                    'latency': round(state.latency, 3),
+                    'error_rate': round(state.error_rate, 3),
+                    'requests': state.requests,
+                    'failures': state.failures,
+                    'ejected': bool(state.ejected_until),
+                }
+                for state in self.states.values()
+            ]
+
+    @staticmethod
+    def as_requests(proxy):
+        return {
+            'http': proxy,
+            'https': proxy,
+        }
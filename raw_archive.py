@@ -0,0 +1,314 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Compressed archive of raw result pages, so results can be
+# re-parsed offline instead of re-fetched. Pages are compressed with zstd when
+# the zstandard package is installed and gzip otherwise, stored once per
+# distinct content in append-only segment files, and located through an
+# append-only roll -> (hash, segment, offset, length, codec) index. The reparse
+# command re-parses an exam's archives on a process pool and appends the
+# results that changed to the exam's store, which re-exports its JSON; rolls
+# scraped before archiving was turned on keep their stored result.
+#
+# Usage: python raw_archive.py reparse [--archive DIR ...] [--workers N]
+#                                      [--exam ID | --manifest exams.json]
+#        python raw_archive.py stats [--archive DIR]
+#        python raw_archive.py show ROLL [--archive DIR]
+# ------------------------------------------------------------------------------
+
+import argparse
+import gzip
+import hashlib
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from result_parser import parse_result
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ARCHIVE_DIR = "raw_archive"
+INDEX_FILE = "index.tsv"
+SEGMENT_SIZE = 256 * 1024 * 1024
+
+CODEC_GZIP = "gzip"
+CODEC_ZSTD = "zstd"
+
+
+def segment_name(number):
+    return f"segment-{number:05d}.bin"
+
+
+def compress(content, codec):
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=3).compress(content)
+    return gzip.compress(content, compresslevel=6)
+
+
+def decompress(blob, codec):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise Exception("This archive entry is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return gzip.decompress(blob)
+
+
+class RawArchive:
+    def __init__(self, directory=ARCHIVE_DIR, segment_size=SEGMENT_SIZE, codec=None):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.codec = codec or (CODEC_ZSTD if zstandard is not None else CODEC_GZIP)
+        self.lock = threading.Lock()
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.rolls = {}
+        self.blobs = {}
+        self.segment = None
+        self.segment_number = 0
+        self.index_file = None
+
+    def open(self):
+        """Load the index and open the newest segment for appending"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._repair_index()
+        self.load_index()
+        self.segment_number = max((location[0] for location in self.blobs.values()), default=0)
+        self.segment = open(os.path.join(self.directory, segment_name(self.segment_number)), 'ab')
+        self.index_file = open(self.index_path, 'a', encoding='utf-8')
+        return self
+
+    def close(self):
+        with self.lock:
+            if self.segment:
+                self.segment.close()
+                self.index_file.close()
+                self.segment = self.index_file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.rolls)
+
+    def add(self, roll, content):
+        """Archive one raw page; identical content is stored only once"""
+        digest = hashlib.sha1(content).hexdigest()
+        with self.lock:
+            if self.rolls.get(roll) == digest:
+                return
+            location = self.blobs.get(digest)
+            if location is None:
+                blob = compress(content, self.codec)
+                if self.segment.tell() and self.segment.tell() + len(blob) > self.segment_size:
+                    self.segment.close()
+                    self.segment_number += 1
+                    self.segment = open(os.path.join(self.directory, segment_name(self.segment_number)), 'ab')
+                offset = self.segment.tell()
+                self.segment.write(blob)
+                # The blob must reach the segment before an index line points at it
+                self.segment.flush()
+                location = self.blobs[digest] = (self.segment_number, offset, len(blob), self.codec)
+            self.rolls[roll] = digest
+            segment, offset, length, codec = location
+            self.index_file.write(f"{roll}\t{digest}\t{segment}\t{offset}\t{length}\t{codec}\n")
+            self.index_file.flush()
+
+    def locate(self, roll):
+        """(segment, offset, length, codec) of the latest page for a roll, or None"""
+        digest = self.rolls.get(roll)
+        return self.blobs[digest] if digest else None
+
+    def get(self, roll):
+        location = self.locate(roll)
+        if location is None:
+            return None
+        return read_blob(self.directory, *location)
+
+    def entries(self):
+        """(roll, segment, offset, length, codec) for the latest page of every roll, in archive order"""
+        return [(roll,) + self.blobs[digest] for roll, digest in self.rolls.items()]
+
+    def import_archive(self, directory):
+        """Add the latest page of every roll archived in `directory`; returns how many rolls it had"""
+        source = RawArchive(directory)
+        source.load_index()
+        handles = {}
+        try:
+            for roll, segment, offset, length, codec in source.entries():
+                if segment not in handles:
+                    handles[segment] = open(os.path.join(directory, segment_name(segment)), 'rb')
+                f = handles[segment]
+                f.seek(offset)
+                self.add(roll, decompress(f.read(length), codec))
+        finally:
+            for f in handles.values():
+                f.close()
+        return len(source)
+
+    def _repair_index(self):
+        """Drop a partially written last index line so new lines start cleanly"""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
+    def load_index(self):
+        """Read the index only; enough for lookups and reparse without opening for writing"""
+        self.rolls = {}
+        self.blobs = {}
+        if not os.path.exists(self.index_path):
+            return
+        sizes = {}
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) != 6 or not line.endswith('\n'):
+                    continue
+                roll, digest, segment, offset, length, codec = fields
+                segment, offset, length = int(segment), int(offset), int(length)
+                if segment not in sizes:
+                    path = os.path.join(self.directory, segment_name(segment))
+                    sizes[segment] = os.path.getsize(path) if os.path.exists(path) else 0
+                # Skip entries whose blob did not make it to disk before a crash
+                if offset + length > sizes[segment]:
+                    continue
+                self.blobs[digest] = (segment, offset, length, codec)
+                self.rolls[roll] = digest
+
+
+def read_blob(directory, segment, offset, length, codec):
+    with open(os.path.join(directory, segment_name(segment)), 'rb') as f:
+        f.seek(offset)
+        return decompress(f.read(length), codec)
+
+
+def _reparse_chunk(entries):
+    """Worker: re-parse (directory, roll, segment, offset, length, codec) entries"""
+    handles = {}
+    results = []
+    try:
+        for directory, roll, segment, offset, length, codec in entries:
+            key = (directory, segment)
+            if key not in handles:
+                handles[key] = open(os.path.join(directory, segment_name(segment)), 'rb')
+            f = handles[key]
+            f.seek(offset)
+            try:
+                results.append(parse_result(roll, decompress(f.read(length), codec)))
+            except Exception as e:
+                results.append({'roll': roll, 'status': 'ERROR', 'error': str(e)})
+    finally:
+        for f in handles.values():
+            f.close()
+    return results
+
+
+def reparse(directories, workers=None, chunk_size=2000):
+    """Parse the latest archived page of every roll; later archives win for the same roll"""
+    entries = {}
+    for directory in directories:
+        archive = RawArchive(directory)
+        archive.load_index()
+        for entry in archive.entries():
+            entries[entry[0]] = (directory,) + entry
+    entries = list(entries.values())
+    chunks = [entries[i:i + chunk_size] for i in range(0, len(entries), chunk_size)]
+    results = []
+    if workers == 1:
+        for chunk in chunks:
+            results.extend(_reparse_chunk(chunk))
+        return results
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_results in executor.map(_reparse_chunk, chunks):
+            results.extend(chunk_results)
+    return results
+
+
+def changed_results(results, latest):
+    """Re-parsed results that differ from the stored latest record of their roll.
+
+    Pages that failed to parse leave the stored result alone.
+    """
+    return [result for result in results if result['status'] != 'ERROR' and latest.get(result['roll']) != result]
+
+
+def reparse_exam(exam, directories, workers=None):
+    """Re-parse an exam's archives into its store and re-export its JSON.
+
+    `directories` are taken inside the exam directory. Changed results are
+    appended to the store like fresh ones, superseding the old lines, so the
+    roll index and the next scrape's export see them too. Returns (results,
+    errors, changed, exported).
+    """
+    results = reparse([exam.path(directory) for directory in directories], workers)
+    errors = [result for result in results if result['status'] == 'ERROR']
+    # Imports the legacy JSON when the exam has no store yet
+    exam.open()
+    try:
+        latest = {record['roll']: record for record in exam.store.latest_records()}
+        changed = changed_results(results, latest)
+        exam.store.extend(changed)
+    finally:
+        exam.close()
+    if changed:
+        # Superseded records left the aggregate flagged stale; recount it
+        exam.store.rebuild_stats()
+    return results, errors, changed, exam.export_json()
+
+
+def main():
+    # Imported here: exams imports this module for the archive
+    from exams import Exam, DEFAULT_EXAM, load_manifest
+
+    parser = argparse.ArgumentParser(description="Inspect the raw page archive or rebuild results from it.")
+    parser.add_argument("command", choices=["reparse", "stats", "show"], help="reparse: update the exam's results from its archive, stats: archive size, show: print a roll's page")
+    parser.add_argument("roll", nargs="?", help="Roll number for show")
+    parser.add_argument("--archive", action="append", help=f"Archive directory inside the exam directory, repeatable; later ones win for the same roll (default: {ARCHIVE_DIR})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Parser processes (default: CPU count, 1 disables the pool)")
+    parser.add_argument("--exam", default=DEFAULT_EXAM, help=f"Exam id when no manifest is given (default: {DEFAULT_EXAM})")
+    parser.add_argument("--manifest", help="Work on every exam of this manifest, each in its own directory (see get_result_multi.py)")
+    args = parser.parse_args()
+    directories = args.archive or [ARCHIVE_DIR]
+    targets = load_manifest(args.manifest) if args.manifest else [Exam(args.exam)]
+
+    if args.command == "show":
+        if not args.roll:
+            parser.error("show needs a roll number")
+        for exam in targets:
+            for directory in reversed(directories):
+                archive = RawArchive(exam.path(directory))
+                archive.load_index()
+                content = archive.get(args.roll)
+                if content is not None:
+                    print(content.decode('utf-8', 'replace'))
+                    return
+        print(f"No archived page for roll number: {args.roll}")
+        return
+
+    if args.command == "stats":
+        for exam in targets:
+            for directory in directories:
+                archive = RawArchive(exam.path(directory))
+                archive.load_index()
+                stored = sum(location[2] for location in archive.blobs.values())
+                print(f"📦 {exam.path(directory)}: {len(archive.rolls)} rolls, {len(archive.blobs)} distinct pages, {stored / 1024 / 1024:.1f} MB compressed")
+        return
+
+    for exam in targets:
+        results, errors, changed, exported = reparse_exam(exam, directories, args.workers)
+        print(f"💾 {exam.name}: re-parsed {len(results) - len(errors)} archived pages, {len(changed)} changed results saved to {exam.store.path}")
+        print(f"💾 Exported {exported} results to {exam.store.legacy_json}")
+        if errors:
+            print(f"⚠️ {len(errors)} pages failed to parse, e.g. {errors[0]['roll']}: {errors[0]['error']}")
+
+
+if __name__ == "__main__":
+    main()
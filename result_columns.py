@@ -0,0 +1,244 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Columnar backend for analyze_result.py. Results are converted
+# once into NumPy arrays with categorical codes for subject code, status,
+# position and subject, cached next to the JSON file, and aggregated with
+# vectorized group-bys. process_columns returns the same statistics, in the
+# same order, as analyze_result.process_data. compare_columns aligns several
+# exams by subject code and position with bincounts over shared category ids,
+# and finds candidates present in more than one exam by joining hashed
+# name/father/mother keys.
+# ------------------------------------------------------------------------------
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+COLUMNS_FILE = "all_results.npz"
+# Bumped when build_columns adds or changes a column, so older caches are rebuilt
+COLUMNS_VERSION = 2
+PERSON_FIELDS = ("Name", "Father", "Mother")
+UNKNOWN_POSITION = "UNKNOWN POSITION"
+UNKNOWN_SUBJECT = "UNKNOWN SUBJECT"
+
+
+def _categorical(values):
+    """Encode strings as (categories, ids); falsy values get id -1"""
+    present = [value for value in values if value]
+    categories = np.unique(np.array(present, dtype=str)) if present else np.array([], dtype=str)
+    lookup = {value: i for i, value in enumerate(categories.tolist())}
+    ids = np.fromiter((lookup[value] if value else -1 for value in values), dtype=np.int32, count=len(values))
+    return categories, ids
+
+
+def _person_key(candidate):
+    """64-bit hash of the normalized name and parents, 0 when the name is missing"""
+    details = candidate.get("personal_details") or {}
+    parts = [" ".join(str(details.get(field) or "").upper().split()) for field in PERSON_FIELDS]
+    if not parts[0]:
+        return 0
+    digest = hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True) or 1
+
+
+def build_columns(data):
+    rolls = [candidate.get("roll", "") for candidate in data]
+    codes = [roll[:3] if len(roll) >= 3 else "" for roll in rolls]
+    statuses = [(candidate.get("status") or "").upper() for candidate in data]
+    positions = [candidate.get("position") for candidate in data]
+    subjects = [candidate.get("subject") for candidate in data]
+
+    code_cats, code_ids = _categorical(codes)
+    status_cats, status_ids = _categorical(statuses)
+    position_cats, position_ids = _categorical(positions)
+    subject_cats, subject_ids = _categorical(subjects)
+    return {
+        "rolls": np.array(rolls, dtype=str),
+        "code_cats": code_cats, "code_ids": code_ids,
+        "status_cats": status_cats, "status_ids": status_ids,
+        "position_cats": position_cats, "position_ids": position_ids,
+        "subject_cats": subject_cats, "subject_ids": subject_ids,
+        "person_keys": np.fromiter((_person_key(candidate) for candidate in data), dtype=np.int64, count=len(data)),
+    }
+
+
+def _source_stamp(results_file):
+    stat = os.stat(results_file)
+    return np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+
+def load_columns(results_file="all_results.json", columns_file=COLUMNS_FILE):
+    """Columns for `results_file`, rebuilt only when the JSON file has changed"""
+    stamp = _source_stamp(results_file)
+    if os.path.exists(columns_file):
+        with np.load(columns_file) as cached:
+            current = "version" in cached.files and int(cached["version"]) == COLUMNS_VERSION
+            if current and np.array_equal(cached["source"], stamp):
+                return {name: cached[name] for name in cached.files if name not in ("source", "version")}
+
+    with open(results_file, "r", encoding="utf-8") as f:
+        columns = build_columns(json.load(f))
+    temp_file = columns_file + ".tmp.npz"
+    np.savez(temp_file, source=stamp, version=np.array(COLUMNS_VERSION), **columns)
+    os.replace(temp_file, columns_file)
+    return columns
+
+
+def _category_id(categories, value):
+    matches = np.nonzero(categories == value)[0]
+    return int(matches[0]) if len(matches) else -2
+
+
+def _first_occurrence(keys):
+    """Unique keys ordered by where they first appear, with their counts"""
+    unique, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    order = np.argsort(first, kind="stable")
+    return unique[order], counts[order]
+
+
+def _resolve(columns):
+    """Rows with a subject code: (code, passed, failed, effective position ids, subject_code_map).
+
+    Position ids index position_cats with UNKNOWN_POSITION appended.
+    """
+    code_cats = columns["code_cats"].tolist()
+    position_cats = columns["position_cats"].tolist() + [UNKNOWN_POSITION]
+    subject_cats = columns["subject_cats"].tolist()
+    unknown_position = len(position_cats) - 1
+
+    valid = columns["code_ids"] >= 0
+    code = columns["code_ids"][valid]
+    status = columns["status_ids"][valid]
+    position = columns["position_ids"][valid]
+    subject = columns["subject_ids"][valid]
+
+    passed = status == _category_id(columns["status_cats"], "PASSED")
+    failed = status == _category_id(columns["status_cats"], "FAILED")
+    complete = (position >= 0) & (subject >= 0)
+
+    # Code -> (position, subject) of the first PASSED row that has both
+    mapped = passed & complete
+    map_codes, map_first = np.unique(code[mapped], return_index=True)
+    order = np.argsort(map_first, kind="stable")
+    map_codes, map_first = map_codes[order], map_first[order]
+    map_position = np.full(len(code_cats), -1, dtype=np.int32)
+    map_position[map_codes] = position[mapped][map_first]
+    subject_code_map = {
+        code_cats[c]: (position_cats[p], subject_cats[s])
+        for c, p, s in zip(map_codes.tolist(), position[mapped][map_first].tolist(), subject[mapped][map_first].tolist())
+    }
+
+    # Rows missing a position or subject borrow the mapped position for their code
+    borrowed = map_position[code]
+    effective = np.where(
+        complete, position,
+        np.where(borrowed >= 0, borrowed, np.where(position >= 0, position, unknown_position))
+    )
+    return code, passed, failed, effective, subject_code_map
+
+
+def process_columns(columns):
+    code_cats = columns["code_cats"].tolist()
+    position_cats = columns["position_cats"].tolist() + [UNKNOWN_POSITION]
+    code, passed, failed, effective, subject_code_map = _resolve(columns)
+
+    total_codes, total = _first_occurrence(code)
+    total_counts = {code_cats[c]: int(n) for c, n in zip(total_codes.tolist(), total.tolist())}
+
+    failed_codes, failed_total = _first_occurrence(code[failed])
+    failed_counts = {code_cats[c]: int(n) for c, n in zip(failed_codes.tolist(), failed_total.tolist())}
+
+    pair_keys, pair_total = _first_occurrence(code[passed].astype(np.int64) * len(position_cats) + effective[passed])
+    passed_counts = {}
+    for key, n in zip(pair_keys.tolist(), pair_total.tolist()):
+        c, p = divmod(key, len(position_cats))
+        passed_counts.setdefault(code_cats[c], {})[position_cats[p]] = int(n)
+
+    return {
+        "total_candidates": int(len(columns["code_ids"])),
+        "subject_code_map": subject_code_map,
+        "passed_counts": passed_counts,
+        "failed_counts": failed_counts,
+        "total_counts": total_counts,
+        "overall_passed": int(passed.sum()),
+        "overall_failed": int(failed.sum())
+    }
+
+
+def _global_ids(categories, all_categories):
+    """Map an exam's local category ids onto positions in the sorted union"""
+    return np.searchsorted(all_categories, categories).astype(np.int64)
+
+
+def compare_columns(exams):
+    """Align several exams' columns by subject code; `exams` is [(name, columns)] in order.
+
+    Returns the union of codes and positions, per-exam count matrices (exam x
+    code, exam x position), pass/fail rates in percent (NaN where an exam has
+    no candidates for a code), the fail rate change between consecutive exams
+    in percentage points, and candidates found in several exams.
+    """
+    names = [name for name, _ in exams]
+    codes = np.unique(np.concatenate([columns["code_cats"] for _, columns in exams]))
+    known_positions = np.unique(np.concatenate([columns["position_cats"] for _, columns in exams]))
+    positions = known_positions.tolist() + [UNKNOWN_POSITION]
+
+    total = np.zeros((len(exams), len(codes)), dtype=np.int64)
+    passed_total = np.zeros_like(total)
+    failed_total = np.zeros_like(total)
+    position_total = np.zeros((len(exams), len(positions)), dtype=np.int64)
+    subject_names = {}
+    overall = []
+    person_keys = []
+
+    for i, (name, columns) in enumerate(exams):
+        code, passed, failed, effective, subject_code_map = _resolve(columns)
+        code = _global_ids(columns["code_cats"], codes)[code]
+        # The appended UNKNOWN_POSITION id maps to the appended slot of the union
+        position_map = np.append(_global_ids(columns["position_cats"], known_positions), len(positions) - 1)
+        effective = position_map[effective]
+
+        total[i] = np.bincount(code, minlength=len(codes))
+        passed_total[i] = np.bincount(code[passed], minlength=len(codes))
+        failed_total[i] = np.bincount(code[failed], minlength=len(codes))
+        position_total[i] = np.bincount(effective[passed], minlength=len(positions))
+        for subject_code, (_, subject) in subject_code_map.items():
+            subject_names.setdefault(subject_code, subject)
+        overall.append((int(len(columns["code_ids"])), int(passed.sum()), int(failed.sum())))
+        keys = columns["person_keys"]
+        person_keys.append(np.unique(keys[keys != 0]))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pass_rate = np.where(total > 0, passed_total * 100.0 / total, np.nan)
+        fail_rate = np.where(total > 0, failed_total * 100.0 / total, np.nan)
+    fail_change = np.diff(fail_rate, axis=0)
+
+    # Keys are unique within an exam, so a key's count is the number of exams it appears in
+    _, exam_counts = np.unique(np.concatenate(person_keys), return_counts=True)
+    overlap = np.zeros((len(exams), len(exams)), dtype=np.int64)
+    for i in range(len(exams)):
+        for j in range(i, len(exams)):
+            overlap[i, j] = overlap[j, i] = len(np.intersect1d(person_keys[i], person_keys[j], assume_unique=True))
+
+    return {
+        "names": names,
+        "codes": codes.tolist(),
+        "subject_names": subject_names,
+        "positions": positions,
+        "overall": overall,
+        "total": total,
+        "passed": passed_total,
+        "failed": failed_total,
+        "pass_rate": pass_rate,
+        "fail_rate": fail_rate,
+        "fail_change": fail_change,
+        "position_counts": position_total,
+        "identified": [len(keys) for keys in person_keys],
+        # appearances[k]: candidates found in exactly k exams
+        "appearances": np.bincount(exam_counts, minlength=len(exams) + 1).tolist(),
+        "overlap": overlap,
+    }
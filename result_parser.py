@@ -0,0 +1,111 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Parser for Teletalk result pages shared by the scrapers. FAILED
+# pages are recognised from the raw bytes without building a DOM; for PASSED
+# pages only the result cell is parsed and read in a single walk over its
+# children instead of running separate XPath queries from the document root.
+# ------------------------------------------------------------------------------
+
+from lxml import etree, html
+
+PASSED_TEXT = 'CONGRATULATIONS, PASSED THE FINAL EXAM'
+FAILED_TEXT = 'SORRY! YOU ARE NOT QUALIFIED!'
+PASSED_BYTES = PASSED_TEXT.encode()
+FAILED_BYTES = FAILED_TEXT.encode()
+# The server's rate-limit page (fixtures/result_malformed.html) parses like a
+# page without a result, so callers must check for it before parse_result
+THROTTLED_TEXT = 'Too many requests. Please try again later.'
+THROTTLED_BYTES = THROTTLED_TEXT.encode()
+THROTTLED_STATUS = 429
+
+STATUS_SPAN = etree.XPath('(//span[@class="red12bold"])[1]')
+
+
+def is_throttled(status_code, content):
+    """True for a rate-limit answer: HTTP 429 or the rate-limit page"""
+    return status_code == THROTTLED_STATUS or THROTTLED_BYTES in content
+
+
+def parse_result(roll, content):
+    """Turn a result page into the result dict stored by the scrapers.
+
+    Raises ParserError('Document is empty') for blank pages and ValueError for
+    pages that are neither a PASSED nor a FAILED result.
+    """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+
+    result_data = {
+        'roll': roll,
+        'status': None,
+        'position': None,
+        'subject': None,
+        'personal_details': {}
+    }
+
+    if FAILED_BYTES in content and PASSED_BYTES not in content:
+        result_data['status'] = 'FAILED'
+        return result_data
+
+    spans = None
+    if PASSED_BYTES in content:
+        cell = _result_cell(content)
+        if cell is not None:
+            spans = STATUS_SPAN(cell)
+    if not spans or spans[0].text != PASSED_TEXT:
+        spans = STATUS_SPAN(html.fromstring(content))
+    status = spans[0].text if spans else None
+
+    if status == PASSED_TEXT:
+        result_data['status'] = 'PASSED'
+        td = spans[0].getparent()
+
+        # One pass over the cell: its direct text nodes (td.text plus every
+        # child's tail) hold the personal details, the black12bold spans hold
+        # the position (2nd) and subject (3rd).
+        texts = [td.text]
+        labels = []
+        for child in td:
+            if child.tag == 'span' and child.get('class') == 'black12bold':
+                labels.append(child.text)
+            texts.append(child.tail)
+
+        if len(labels) < 3 or labels[1] is None or labels[2] is None:
+            raise ValueError(f"Incomplete result page for roll {roll}")
+        result_data['position'] = labels[1].strip()
+        result_data['subject'] = labels[2].strip()
+
+        details_dict = {}
+        for text in texts:
+            if not text:
+                continue
+            line = text.strip()
+            if ':' in line:
+                key, value = line.split(':', 1)
+                if key == 'Roll':
+                    continue
+                details_dict[key.strip()] = value.strip()
+
+        result_data['personal_details'] = details_dict
+    elif status == FAILED_TEXT:
+        result_data['status'] = 'FAILED'
+    else:
+        raise ValueError(f"Unexpected result page for roll {roll}")
+
+    return result_data
+
+
+def _result_cell(content):
+    """Parse just the <td> around the PASSED banner, or None if it can't be isolated"""
+    marker = content.find(PASSED_BYTES)
+    start = content.rfind(b'<td', 0, marker)
+    end = content.find(b'</td>', marker)
+    if start == -1 or end == -1 or content.find(b'<td', marker, end) != -1:
+        return None
+    try:
+        fragment = content[start:end + 5].decode('utf-8')
+        return html.fragment_fromstring(fragment)
+    except (UnicodeDecodeError, etree.ParserError):
+        return None
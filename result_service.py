@@ -0,0 +1,238 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Long-running query service behind analyze_result.py --serve.
+# The results are loaded once into a snapshot holding a roll -> record index,
+# the subject statistics and the fail-rate ranking, with the subject answers
+# already encoded, so a query is a dict lookup. A watcher thread re-reads the
+# results file when it changes and swaps in the new snapshot; requests keep
+# using the old one until the swap, so reloads never block lookups.
+#
+# Endpoints (GET, JSON): /roll/<roll>, /subject/<code>, /subjects,
+# /fail-rate?limit=10, /summary
+# ------------------------------------------------------------------------------
+
+import json
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from result_store import iter_results_file
+from subject_stats import SubjectStats, UNKNOWN_POSITION, UNKNOWN_SUBJECT
+
+
+def encode(data):
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+def source_stamp(filename):
+    """(mtime_ns, size) of the results file, or None while it is missing"""
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class Snapshot:
+    """Immutable in-memory view of one version of the results file"""
+
+    def __init__(self, records, stamp):
+        self.stamp = stamp
+        self.loaded_at = time.time()
+        self.by_roll = {}
+        for record in records:
+            roll = record.get('roll')
+            if roll:
+                # A JSON lines store can hold older versions of a roll; the last one wins
+                self.by_roll[roll] = record
+        self.stats = SubjectStats().update(self.by_roll.values()).finalize()
+
+        self.subjects = {code: self.subject_entry(code) for code in self.stats['total_counts']}
+        self.subject_bodies = {code: encode(entry) for code, entry in self.subjects.items()}
+        # Same order as analyze_result.py -f: fail percentage, ties in first-seen order
+        self.ranking = sorted(
+            self.subjects.values(),
+            key=lambda entry: entry['failed'] / entry['total'] if entry['total'] > 0 else 0,
+            reverse=True,
+        )
+        self.summary = {
+            'total_candidates': self.stats['total_candidates'],
+            'passed': self.stats['overall_passed'],
+            'failed': self.stats['overall_failed'],
+            'subjects': len(self.subjects),
+            'loaded_at': self.loaded_at,
+        }
+        self.subjects_body = encode([self.subjects[code] for code in sorted(self.subjects)])
+        self.ranking_bodies = {}
+
+    def subject_entry(self, code):
+        stats = self.stats
+        position, subject = stats['subject_code_map'].get(code, (UNKNOWN_POSITION, UNKNOWN_SUBJECT))
+        total = stats['total_counts'].get(code, 0)
+        failed = stats['failed_counts'].get(code, 0)
+        return {
+            'code': code,
+            'subject': subject,
+            'position': position,
+            'total': total,
+            'failed': failed,
+            'fail_percentage': round(failed / total * 100, 2) if total > 0 else 0,
+            'passed': dict(stats['passed_counts'].get(code, {})),
+        }
+
+    def ranking_body(self, limit):
+        body = self.ranking_bodies.get(limit)
+        if body is None:
+            # Benign race: two threads may both encode the same limit once
+            body = self.ranking_bodies[limit] = encode(self.ranking[:limit])
+        return body
+
+
+def load_snapshot(filename):
+    stamp = source_stamp(filename)
+    records = iter_results_file(filename) if stamp else []
+    return Snapshot(records, stamp)
+
+
+class ResultService:
+    """Holds the current snapshot and reloads it when the results file changes"""
+
+    def __init__(self, filename="all_results.json", reload_interval=1.0):
+        self.filename = filename
+        self.reload_interval = reload_interval
+        self.snapshot = load_snapshot(filename)
+        self.reloads = 0
+        self.failed_stamp = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.watch, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def watch(self):
+        while not self.stopped.wait(self.reload_interval):
+            self.reload_if_changed()
+
+    def reload_if_changed(self):
+        stamp = source_stamp(self.filename)
+        if stamp in (self.snapshot.stamp, self.failed_stamp):
+            return False
+        try:
+            snapshot = load_snapshot(self.filename)
+        except Exception as e:
+            # E.g. a writer that does not replace the file atomically; retried once the file changes again
+            self.failed_stamp = stamp
+            print(f"⚠️ Reloading {self.filename} failed, still serving the previous data: {e}")
+            return False
+        self.snapshot = snapshot
+        self.reloads += 1
+        print(f"🔄 Reloaded {self.filename}: {len(snapshot.by_roll)} candidates, {len(snapshot.subjects)} subjects")
+        return True
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Answers are tiny; do not let Nagle hold them back on kept-alive connections
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, body, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        self.send_json(encode({'error': message}), status)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        snapshot = self.server.service.snapshot
+
+        if len(parts) == 2 and parts[0] == 'roll':
+            record = snapshot.by_roll.get(parts[1])
+            if record is None:
+                self.send_error_json(404, f"No candidate found with roll number: {parts[1]}")
+            else:
+                self.send_json(encode(record))
+        elif len(parts) == 2 and parts[0] == 'subject':
+            body = snapshot.subject_bodies.get(parts[1])
+            if body is None:
+                self.send_error_json(404, f"No data found for subject code: {parts[1]}")
+            else:
+                self.send_json(body)
+        elif parts == ['subjects']:
+            self.send_json(snapshot.subjects_body)
+        elif parts == ['fail-rate']:
+            try:
+                limit = int(parse_qs(url.query).get('limit', ['10'])[0])
+            except ValueError:
+                self.send_error_json(400, "limit must be a number")
+                return
+            self.send_json(snapshot.ranking_body(max(limit, 0)))
+        elif parts == ['summary']:
+            summary = dict(snapshot.summary, reloads=self.server.service.reloads)
+            self.send_json(encode(summary))
+        else:
+            self.send_error_json(404, "Unknown endpoint; try /roll/<roll>, /subject/<code>, /subjects, /fail-rate or /summary")
+
+
+class QueryServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, service):
+        super().__init__(address, QueryHandler)
+        self.service = service
+
+
+class UnixQueryHandler(QueryHandler):
+    # TCP_NODELAY does not apply to Unix sockets
+    disable_nagle_algorithm = False
+
+
+class UnixQueryServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, path, service):
+        if os.path.exists(path):
+            os.remove(path)
+        super().__init__(path, UnixQueryHandler)
+        self.service = service
+
+
+def serve(filename="all_results.json", host="127.0.0.1", port=8080, socket_path=None, reload_interval=1.0):
+    """Serve queries until interrupted, on a Unix socket if `socket_path` is given"""
+    service = ResultService(filename, reload_interval).start()
+    snapshot = service.snapshot
+    print(f"📥 Loaded {len(snapshot.by_roll)} candidates, {len(snapshot.subjects)} subjects from {filename}")
+    if socket_path:
+        server = UnixQueryServer(socket_path, service)
+        print(f"🔌 Serving on unix:{socket_path}")
+    else:
+        server = QueryServer((host, port), service)
+        print(f"🔌 Serving on http://{host}:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
@@ -0,0 +1,446 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Append-only result store shared by the scrapers. Each result is
+# one JSON line in all_results.jsonl, so saving a result costs O(1) instead of
+# rewriting the whole file. The legacy all_results.json consumed by
+# analyze_result.py is produced by the export step. Every append also updates
+# a materialized per-subject aggregate (subject_stats.json), saved on each
+# sync, so analyze_result.py can print the tables without re-reading results.
+# Appends and aggregate saves take an exclusive flock on the store, so a second
+# process (reverify.py next to a running scrape) can append safely; lines it
+# did not write itself mark the aggregate stale instead of being miscounted.
+# Opening the store (legacy import, crash repair) holds the same lock.
+#
+# Usage: python result_store.py export   # rebuild all_results.json
+#        python result_store.py compact  # drop superseded lines in the store
+# ------------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import re
+import struct
+import threading
+from contextlib import contextmanager
+
+from sorted_index import SortedIndex, write_index
+from subject_stats import STATS_FILE, SubjectStats, read_stats_file
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+RESULTS_STORE = "all_results.jsonl"
+RESULTS_JSON = "all_results.json"
+ROLL_INDEX = "all_results.rollidx"
+# Roll index records: roll padded to a fixed width -> (byte offset, line length)
+ROLL_KEY_WIDTH = 12
+ROLL_VALUE = struct.Struct('<QI')
+
+# Only these count as done on resume; anything else is fetched again.
+FINAL_STATUSES = ('PASSED', 'FAILED')
+
+# Results are dumped with 'roll' and 'status' as their first keys, which lets
+# resume read them straight from the line prefix without decoding the record.
+KEY_PATTERN = re.compile(rb'^\{"roll": "([^"]*)", "status": (?:"([^"]*)"|null)')
+
+
+class ResultStore:
+    def __init__(self, path=RESULTS_STORE, fsync_every=100, legacy_json=RESULTS_JSON, stats_file=STATS_FILE):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.legacy_json = legacy_json
+        self.stats_file = stats_file
+        self.lock = threading.Lock()
+        self.file = None
+        self.pending = 0
+        self.rolls = set()
+        self.seen = set()
+        self.stats = None
+        self.stats_stale = False
+        # Store size as of this process's last write; anything beyond it was
+        # appended by another process
+        self.size = 0
+
+    def open(self):
+        """Open the store for appending, importing the legacy JSON file on first use.
+
+        The import and the tail repair run under the file lock, so they cannot
+        replace or truncate a line another process is appending.
+        """
+        while True:
+            self.file = open(self.path, 'ab')
+            with self._file_lock():
+                current = os.path.samestat(os.fstat(self.file.fileno()), os.stat(self.path))
+                if current and os.path.getsize(self.path) == 0 and self.legacy_json and os.path.exists(self.legacy_json):
+                    self._import_legacy()
+                    current = False
+                if current:
+                    self._repair_tail()
+                    self.size = os.path.getsize(self.path)
+            if current:
+                break
+            # The file we locked was replaced by a legacy import; lock the new one
+            self.file.close()
+        self.rolls = set()
+        self.seen = set()
+        for roll, status in self.iter_keys():
+            self.seen.add(roll)
+            if status in FINAL_STATUSES:
+                self.rolls.add(roll)
+        if self.stats_file:
+            self._open_stats()
+        return self
+
+    def close(self):
+        if self.file:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, result):
+        self.extend([result])
+
+    def extend(self, results):
+        """Append `results` with a single write under the store's file lock"""
+        lines = [json.dumps(result, ensure_ascii=False).encode('utf-8') + b'\n' for result in results]
+        if not lines:
+            return
+        with self.lock:
+            with self._file_lock():
+                self._check_foreign_lines()
+                self.file.write(b''.join(lines))
+                self.file.flush()
+                self.size = os.fstat(self.file.fileno()).st_size
+            for result in results:
+                if result.get('status') in FINAL_STATUSES:
+                    self.rolls.add(result['roll'])
+                if self.stats is not None:
+                    # The aggregate cannot take back a superseded record; flag it
+                    # so readers recompute until the next rebuild.
+                    if result['roll'] in self.seen:
+                        self.stats_stale = True
+                    else:
+                        self.stats.add(result)
+                self.seen.add(result['roll'])
+            self.pending += len(lines)
+            if self.pending >= self.fsync_every:
+                self._sync_locked()
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive flock on the store file (a no-op where fcntl is missing)"""
+        if fcntl is None:
+            yield
+            return
+        f = self.file if self.file else open(self.path, 'ab')
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        finally:
+            if f is not self.file:
+                f.close()
+
+    def _check_foreign_lines(self):
+        """Flag the aggregate stale if another process appended since our last write"""
+        if os.path.getsize(self.path) != self.size:
+            self.stats_stale = True
+
+    def sync(self):
+        with self.lock:
+            self._sync_locked()
+
+    def _sync_locked(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+        self._save_stats_locked()
+
+    def _open_stats(self):
+        """Load the saved aggregate if it covers exactly this store, else rebuild it"""
+        size = os.path.getsize(self.path)
+        state = read_stats_file(self.stats_file)
+        if state is not None and state.get("store_size") == size and not state.get("stale"):
+            try:
+                self.stats = SubjectStats.from_dict(state)
+                self.stats_stale = False
+                return
+            except (KeyError, ValueError, TypeError) as e:
+                print(f"⚠️ Ignoring {self.stats_file}: {e}")
+        self.rebuild_stats()
+        print(f"📊 Rebuilt {self.stats_file} from {self.stats.total_candidates} results")
+
+    def rebuild_stats(self, records=None):
+        """Recount the aggregate from the latest record per roll, so it is exact again"""
+        with self._file_lock():
+            self.size = os.path.getsize(self.path)
+            self.stats = SubjectStats().update(self.latest_records() if records is None else records)
+            self.stats_stale = False
+            self.stats.save(self.stats_file, store_size=self.size, stale=False)
+
+    def _save_stats_locked(self):
+        if self.stats is not None:
+            with self._file_lock():
+                self._check_foreign_lines()
+                self.stats.save(self.stats_file, store_size=self.size, stale=self.stats_stale)
+
+    def processed_rolls(self):
+        return set(self.rolls)
+
+    def __len__(self):
+        return len(self.rolls)
+
+    def iter_keys(self):
+        """Yield (roll, status) for every line, reading only the line prefix"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            for line in f:
+                match = KEY_PATTERN.match(line)
+                if match:
+                    status = match.group(2)
+                    yield match.group(1).decode('utf-8'), status.decode('utf-8') if status is not None else None
+                    continue
+                record = _decode_line(line)
+                if record is not None:
+                    yield record['roll'], record.get('status')
+
+    def iter_records(self):
+        """Yield every stored record in append order, superseded ones included"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            for line in f:
+                record = _decode_line(line)
+                if record is not None:
+                    yield record
+
+    def latest_records(self):
+        """Latest record per roll, in order of each roll's first appearance"""
+        latest = {}
+        for record in self.iter_records():
+            latest[record['roll']] = record
+        return list(latest.values())
+
+    def export_json(self, filename=None):
+        """Write the deduplicated results as the legacy all_results.json"""
+        filename = filename or self.legacy_json
+        results = self.latest_records()
+        temp_filename = filename + ".tmp"
+        with open(temp_filename, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
+        os.replace(temp_filename, filename)
+        # Re-save the aggregate so it is not older than the file it summarizes
+        with self.lock:
+            self._save_stats_locked()
+        return len(results)
+
+    def compact(self, index_path=ROLL_INDEX):
+        """Rewrite the store keeping only the latest line per roll"""
+        results = self.latest_records()
+        temp_filename = self.path + ".tmp"
+        with open(temp_filename, 'wb') as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False).encode('utf-8') + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_filename, self.path)
+        # Byte offsets changed; the roll index is rebuilt on next use
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        if self.stats_file:
+            # Every roll now has exactly one line
+            self.rebuild_stats(results)
+        return len(results)
+
+    def _import_legacy(self):
+        try:
+            with open(self.legacy_json, 'r', encoding='utf-8') as f:
+                existing_results = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"⚠️ Error reading existing results: {e}")
+            return
+        temp_filename = self.path + ".tmp"
+        with open(temp_filename, 'wb') as f:
+            for result in existing_results:
+                f.write(json.dumps(result, ensure_ascii=False).encode('utf-8') + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_filename, self.path)
+        print(f"📥 Imported {len(existing_results)} results from {self.legacy_json}")
+
+    def _repair_tail(self):
+        """Drop a partially written last line left behind by a crash"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                return
+            block = 4096
+            pos = size
+            while pos > 0:
+                start = max(0, pos - block)
+                f.seek(start)
+                chunk = f.read(pos - start)
+                newline = chunk.rfind(b'\n')
+                if newline != -1:
+                    f.truncate(start + newline + 1)
+                    break
+                pos = start
+            else:
+                f.truncate(0)
+        print(f"⚠️ Dropped a partially written record at the end of {self.path}")
+
+
+def iter_json_array(filename, chunk_size=1 << 20):
+    """Yield the elements of a top-level JSON array without loading the whole file"""
+    decoder = json.JSONDecoder()
+    with open(filename, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer:
+            return
+        if buffer[0] != '[':
+            raise ValueError(f"{filename} does not contain a JSON array")
+        pos = 1
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                if pos >= len(buffer):
+                    raise json.JSONDecodeError("Need more data", buffer, pos)
+                record, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            yield record
+
+
+def iter_results_file(filename):
+    """Stream result records from a JSON array file or a JSON lines store"""
+    if filename.endswith('.jsonl'):
+        return ResultStore(filename, legacy_json=None).iter_records()
+    return iter_json_array(filename)
+
+
+def _roll_key(roll):
+    key = roll.encode('utf-8')
+    if len(key) > ROLL_KEY_WIDTH:
+        return None
+    return key.ljust(ROLL_KEY_WIDTH)
+
+
+def _scan_offsets(store_path, start):
+    """Yield (roll_key, offset, length) for complete lines from `start`, then the end offset"""
+    with open(store_path, 'rb') as f:
+        f.seek(start)
+        offset = start
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            match = KEY_PATTERN.match(line)
+            if match:
+                roll = match.group(1).decode('utf-8')
+            else:
+                record = _decode_line(line)
+                roll = record['roll'] if record is not None else None
+            key = _roll_key(roll) if roll else None
+            if key is not None:
+                yield key, offset, len(line)
+            offset += len(line)
+    yield None, offset, 0
+
+
+def update_roll_index(store_path=RESULTS_STORE, index_path=ROLL_INDEX):
+    """Bring the roll index up to date, scanning only lines appended since the last update"""
+    size = os.path.getsize(store_path)
+    existing = []
+    start = 0
+    if os.path.exists(index_path):
+        with SortedIndex(index_path) as index:
+            if index.source_size == size:
+                return index_path
+            if index.source_size < size:
+                start = index.source_size
+                existing = list(index.items())
+
+    new_records = []
+    end = start
+    for key, offset, length in _scan_offsets(store_path, start):
+        if key is None:
+            end = offset
+            break
+        new_records.append((key, ROLL_VALUE.pack(offset, length)))
+
+    write_index(index_path, existing + new_records, ROLL_KEY_WIDTH, ROLL_VALUE.size, source_size=end)
+    return index_path
+
+
+def lookup_roll(roll, store_path=RESULTS_STORE, index_path=ROLL_INDEX):
+    """Latest stored record for `roll` via the roll index, or None"""
+    key = _roll_key(roll)
+    if key is None or not os.path.exists(store_path):
+        return None
+    update_roll_index(store_path, index_path)
+    with SortedIndex(index_path) as index:
+        value = index.get(key)
+    if value is None:
+        return None
+    offset, length = ROLL_VALUE.unpack(value)
+    with open(store_path, 'rb') as f:
+        f.seek(offset)
+        return _decode_line(f.read(length))
+
+
+def _decode_line(line):
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the append-only result store.")
+    parser.add_argument("command", choices=["export", "compact"], help="export: rebuild all_results.json, compact: drop superseded lines")
+    parser.add_argument("--store", default=RESULTS_STORE, help=f"Store file (default: {RESULTS_STORE})")
+    parser.add_argument("--output", default=RESULTS_JSON, help=f"Export target (default: {RESULTS_JSON})")
+    args = parser.parse_args()
+
+    store = ResultStore(args.store, legacy_json=args.output)
+    with store:
+        pass
+    if args.command == "export":
+        count = store.export_json(args.output)
+        print(f"💾 Exported {count} results to {args.output}")
+    else:
+        count = store.compact()
+        print(f"🧹 Compacted {args.store} to {count} results")
+
+
+if __name__ == "__main__":
+    main()
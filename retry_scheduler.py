@@ -0,0 +1,114 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Non-blocking retry scheduling for the scrapers. Failed rolls go
+# into a delay heap with capped exponential backoff and jitter instead of
+# sleeping inside a worker; rolls that run out of attempts are persisted to a
+# dead-letter file so a later --retry-failed run can pick them up.
+# ------------------------------------------------------------------------------
+
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+
+DEAD_LETTERS_FILE = "dead_letters.json"
+
+
+def backoff_delay(attempt, base_delay=2.0, max_delay=120.0):
+    """Capped exponential backoff with equal jitter for the given retry number"""
+    ceiling = min(max_delay, base_delay * 2 ** attempt)
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+class RetryScheduler:
+    def __init__(self, max_attempts=10, base_delay=2.0, max_delay=120.0, dead_letter_file=DEAD_LETTERS_FILE):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.dead_letter_file = dead_letter_file
+        self.heap = []
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.dead_letters = self._load_dead_letters()
+        self.dead_letters_dirty = False
+
+    def __len__(self):
+        with self.lock:
+            return len(self.heap)
+
+    def schedule(self, roll, attempt, error):
+        """Queue the next attempt for a failed roll.
+
+        `attempt` is the number of attempts made so far. Returns the backoff in
+        seconds, or None when the roll was moved to the dead-letter list.
+        """
+        if attempt >= self.max_attempts:
+            with self.lock:
+                self.dead_letters[roll] = {'roll': roll, 'attempts': attempt, 'error': str(error)}
+                self.dead_letters_dirty = True
+            print(f"☠️ Giving up on roll {roll} after {attempt} attempts: {error}")
+            return None
+
+        delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+        with self.lock:
+            heapq.heappush(self.heap, (time.monotonic() + delay, next(self.counter), roll, attempt))
+        return delay
+
+    def requeue(self, roll, attempt, delay=0.0):
+        """Queue a roll again after `delay` seconds without counting an attempt"""
+        with self.lock:
+            heapq.heappush(self.heap, (time.monotonic() + delay, next(self.counter), roll, attempt))
+
+    def pop_due(self, limit=None):
+        """Remove and return (roll, attempts_so_far) for every retry that is due"""
+        now = time.monotonic()
+        due = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now and (limit is None or len(due) < limit):
+                _, _, roll, attempt = heapq.heappop(self.heap)
+                due.append((roll, attempt))
+        return due
+
+    def next_due_in(self):
+        """Seconds until the next retry is due, or None when nothing is scheduled"""
+        with self.lock:
+            if not self.heap:
+                return None
+            return max(0.0, self.heap[0][0] - time.monotonic())
+
+    def resolve(self, roll):
+        """Forget a dead-lettered roll once it has been fetched successfully"""
+        with self.lock:
+            if self.dead_letters.pop(roll, None) is not None:
+                self.dead_letters_dirty = True
+
+    def dead_letter_rolls(self):
+        with self.lock:
+            return sorted(self.dead_letters)
+
+    def save_dead_letters(self):
+        with self.lock:
+            if not self.dead_letters_dirty:
+                return
+            records = [self.dead_letters[roll] for roll in sorted(self.dead_letters)]
+            self.dead_letters_dirty = False
+        temp_filename = self.dead_letter_file + ".tmp"
+        with open(temp_filename, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False, indent=4)
+        os.replace(temp_filename, self.dead_letter_file)
+        print(f"☠️ {len(records)} rolls in {self.dead_letter_file}")
+
+    def _load_dead_letters(self):
+        if not os.path.exists(self.dead_letter_file):
+            return {}
+        try:
+            with open(self.dead_letter_file, 'r', encoding='utf-8') as f:
+                return {record['roll']: record for record in json.load(f)}
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"⚠️ Error reading dead letters: {e}")
+            return {}
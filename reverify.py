@@ -0,0 +1,271 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Re-verification of results that were already scraped, to catch
+# corrected or re-published results. A compact fingerprint of every final
+# result (status, position, subject and personal details) is kept per exam in
+# fingerprints.tsv with the time it was last confirmed against the server.
+# Each run re-fetches the least recently verified rolls (--sample N, or --all)
+# at low concurrency, appends only the results whose fingerprint changed to
+# the store, logs every change to reverify_log.jsonl and re-exports
+# all_results.json when something changed. Run it every hour or so and it
+# cycles through the whole roll list without ever doing a full scrape. It can
+# run next to a scrape of the same exam: the store serializes appends and
+# aggregate saves between processes with a file lock, and changed pages are
+# archived apart from the scraper's archive.
+#
+# Usage: python reverify.py [--sample 5000 | --all] [--concurrency 4]
+#                           [--priority-prefix 201 ...] [--manifest exams.json]
+# ------------------------------------------------------------------------------
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from lxml.etree import ParserError
+
+from exams import Exam, DEFAULT_EXAM, load_manifest
+from proxy_pool import ProxyPool
+from raw_archive import RawArchive
+from result_parser import parse_result, is_throttled
+from result_store import FINAL_STATUSES
+from transport import Transport
+
+FINGERPRINTS_FILE = "fingerprints.tsv"
+CHANGE_LOG_FILE = "reverify_log.jsonl"
+# Kept apart from the scraper's raw_archive, which a running scrape appends to
+REVERIFY_ARCHIVE_DIR = "raw_archive_reverify"
+# Fields a correction can touch; the roll itself is the key
+COMPARED_FIELDS = ('status', 'position', 'subject', 'personal_details')
+
+
+def fingerprint(result):
+    """16 hex digits identifying the content of a result"""
+    content = [result.get(field) for field in COMPARED_FIELDS]
+    encoded = json.dumps(content, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+
+class Fingerprints:
+    """roll -> (fingerprint, last verified as a unix time, 0 if never)"""
+
+    def __init__(self, path=FINGERPRINTS_FILE):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    fields = line.rstrip('\n').split('\t')
+                    if len(fields) == 3:
+                        self.entries[fields[0]] = (fields[1], int(fields[2]))
+        return self
+
+    def sync_with(self, records):
+        """Fingerprint stored results that are new or changed since the last run"""
+        added = 0
+        for record in records:
+            if record.get('status') not in FINAL_STATUSES:
+                continue
+            digest = fingerprint(record)
+            entry = self.entries.get(record['roll'])
+            if entry is None or entry[0] != digest:
+                # A result re-scraped since the last run counts as unverified
+                self.entries[record['roll']] = (digest, 0)
+                added += 1
+        return added
+
+    def get(self, roll):
+        with self.lock:
+            return self.entries.get(roll)
+
+    def set(self, roll, digest):
+        with self.lock:
+            self.entries[roll] = (digest, int(time.time()))
+
+    def save(self):
+        temp_filename = self.path + ".tmp"
+        with self.lock:
+            entries = sorted(self.entries.items())
+        with open(temp_filename, 'w', encoding='utf-8') as f:
+            for roll, (digest, verified_at) in entries:
+                f.write(f"{roll}\t{digest}\t{verified_at}\n")
+        os.replace(temp_filename, self.path)
+
+
+def select_rolls(fingerprints, sample=None, prefixes=()):
+    """Least recently verified rolls first; within the same time, listed prefixes first"""
+    def key(item):
+        roll, (_, verified_at) = item
+        group = next((i for i, prefix in enumerate(prefixes) if roll.startswith(prefix)), len(prefixes))
+        return (verified_at, group, roll)
+
+    ordered = [roll for roll, _ in sorted(fingerprints.entries.items(), key=key)]
+    return ordered if sample is None else ordered[:sample]
+
+
+class Verifier:
+    def __init__(self, exam, fingerprints, stored, proxy_pool, transport, max_attempts=5):
+        self.exam = exam
+        self.fingerprints = fingerprints
+        # roll -> latest stored record, for the old side of the change report
+        self.stored = stored
+        self.proxy_pool = proxy_pool
+        self.transport = transport
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.counts = {'unchanged': 0, 'changed': 0, 'unavailable': 0, 'errors': 0}
+        self.changes = []
+
+    def fetch(self, roll):
+        for attempt in range(self.max_attempts):
+            with self.proxy_pool.checkout() as proxy:
+                start = time.monotonic()
+                try:
+                    response = self.transport.post(self.exam.form_body(roll), proxy)
+                    if response.status_code >= 500 or not response.content.strip() or is_throttled(response.status_code, response.content):
+                        raise Exception(f"Unusable response ({response.status_code}, {len(response.content)} bytes)")
+                    self.proxy_pool.report(proxy, True, time.monotonic() - start)
+                    return response.content
+                except Exception as e:
+                    self.proxy_pool.report(proxy, False)
+                    error = e
+            if attempt + 1 == self.max_attempts:
+                raise Exception(f"Could not fetch roll {roll}: {error}")
+            time.sleep(min(2 ** attempt, 30))
+
+    def count(self, outcome):
+        with self.lock:
+            self.counts[outcome] += 1
+
+    def verify(self, roll):
+        try:
+            content = self.fetch(roll)
+            result = parse_result(roll, content)
+        except (ValueError, ParserError):
+            # The page came back without a result; keep what we have
+            self.count('unavailable')
+            return
+        except Exception as e:
+            print(f"❌ {self.exam.name} {roll}: {e}")
+            self.count('errors')
+            return
+
+        digest = fingerprint(result)
+        previous = self.fingerprints.get(roll)
+        if previous is None or previous[0] != digest:
+            old = self.stored.get(roll) or {}
+            if self.exam.archive is not None:
+                self.exam.archive.add(roll, content)
+            self.exam.store.append(result)
+            change = {
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'exam': self.exam.name,
+                'roll': roll,
+                'fields': [field for field in COMPARED_FIELDS if old.get(field) != result.get(field)],
+                'old': {field: old.get(field) for field in COMPARED_FIELDS},
+                'new': {field: result.get(field) for field in COMPARED_FIELDS},
+            }
+            with self.lock:
+                self.changes.append(change)
+            self.count('changed')
+            print(f"🔄 {self.exam.name} {roll}: {', '.join(change['fields'])} changed")
+        else:
+            self.count('unchanged')
+        self.fingerprints.set(roll, digest)
+
+    def run(self, rolls, concurrency, stop_event, save_every=1000):
+        """Verify `rolls` with at most twice `concurrency` of them queued at once"""
+        rolls = iter(rolls)
+        futures = set()
+        done_count = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while not stop_event.is_set():
+                while len(futures) < concurrency * 2:
+                    roll = next(rolls, None)
+                    if roll is None:
+                        break
+                    futures.add(executor.submit(self.verify, roll))
+                if not futures:
+                    break
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                done_count += len(done)
+                if done_count >= save_every:
+                    self.fingerprints.save()
+                    done_count = 0
+
+
+def write_change_log(changes, filename=CHANGE_LOG_FILE):
+    with open(filename, 'a', encoding='utf-8') as f:
+        for change in changes:
+            f.write(json.dumps(change, ensure_ascii=False) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-fetch already scraped results and record the ones that changed.")
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument("--sample", type=int, default=5000, help="Least recently verified rolls to re-fetch per exam (default: 5000)")
+    selection.add_argument("--all", action="store_true", help="Re-fetch every stored result")
+    parser.add_argument("--priority-prefix", nargs="+", default=[], metavar="PREFIX", help="Among equally stale rolls, verify these subject-code prefixes first")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel requests; keep it low next to a running scrape (default: 4)")
+    parser.add_argument("--exam", default=DEFAULT_EXAM, help=f"Exam id sent with the form (default: {DEFAULT_EXAM})")
+    parser.add_argument("--manifest", help="Verify every exam of this manifest (see get_result_multi.py)")
+    parser.add_argument("--archive", action="store_true", help=f"Keep the raw pages of changed results in {REVERIFY_ARCHIVE_DIR}; pass it after the scraper's archive to raw_archive.py reparse --archive")
+    parser.add_argument("--log", default=CHANGE_LOG_FILE, help=f"Change report, one JSON line per changed result (default: {CHANGE_LOG_FILE})")
+    args = parser.parse_args()
+
+    exams = load_manifest(args.manifest) if args.manifest else [Exam(args.exam)]
+    proxy_pool = ProxyPool.from_file('proxy.txt')
+    proxy_pool.probe_all()
+    transport = Transport(pool_connections=len(proxy_pool))
+    stop_event = threading.Event()
+
+    totals = {}
+    try:
+        for exam in exams:
+            exam.open()
+            if args.archive:
+                exam.archive = RawArchive(exam.path(REVERIFY_ARCHIVE_DIR)).open()
+            fingerprints = Fingerprints(exam.path(FINGERPRINTS_FILE)).load()
+            records = exam.store.latest_records()
+            verifier = Verifier(exam, fingerprints, {record['roll']: record for record in records}, proxy_pool, transport)
+            try:
+                added = fingerprints.sync_with(records)
+                if added:
+                    print(f"🧾 {exam.name}: fingerprinted {added} new or re-scraped results")
+                rolls = select_rolls(fingerprints, None if args.all else args.sample, args.priority_prefix)
+                print(f"📋 {exam.name}: verifying {len(rolls)} of {len(fingerprints.entries)} results")
+                verifier.run(rolls, args.concurrency, stop_event)
+            except KeyboardInterrupt:
+                stop_event.set()
+                print("🚫 Interrupted, saving what was verified so far")
+                raise
+            finally:
+                fingerprints.save()
+                write_change_log(verifier.changes, args.log)
+                exam.close()
+                if verifier.changes:
+                    # Superseded records left the aggregate flagged stale; recount it
+                    exam.store.rebuild_stats()
+                    exported = exam.export_json()
+                    print(f"💾 Exported {exported} results to {exam.store.legacy_json}")
+                totals[exam.name] = verifier.counts
+    except KeyboardInterrupt:
+        pass
+    finally:
+        transport.close()
+
+    for name, counts in totals.items():
+        print(f"📊 {name}: " + ", ".join(f"{outcome}: {count}" for outcome, count in counts.items()))
+    print("🎉 Re-verification completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Roll -> viva date, schedule file and page index built by
+# extract_rolls.py. Two sorted fixed-width indexes are kept on disk: one keyed
+# by roll for O(log n) lookups and one keyed by viva date + roll for date range
+# scans, so nothing has to re-read the schedule PDFs.
+#
+# Usage: python schedule_index.py ROLL
+#        python schedule_index.py --from 2024-11-14 [--to 2024-11-20]
+# ------------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import re
+from datetime import date
+
+from sorted_index import SortedIndex, write_index
+
+INDEX_PREFIX = 'schedule_index'
+ROLL_INDEX = INDEX_PREFIX + '.roll'
+DATE_INDEX = INDEX_PREFIX + '.date'
+FILES_INDEX = INDEX_PREFIX + '.json'
+
+# Page headers start with the viva date, e.g. "14.11.2024" or "31/05/2025".
+# The extracted text runs it straight into the heading ("14.11.2024NON-GOVERNMENT"),
+# so the date is delimited by non-digits rather than word boundaries.
+PAGE_DATE_PATTERN = re.compile(r'(?<!\d)(\d{1,2})[./](\d{1,2})[./](20\d{2})(?!\d)')
+# File names start with the first viva day, e.g. "27_10_to_13_11.pdf"
+FILE_DATE_PATTERN = re.compile(r'^(\d{1,2})_(\d{1,2})')
+
+# The 18th NTRCA vivas ran from October 2024 into 2025; file names carry no
+# year, so months from July on belong to this year and earlier ones to the next.
+SEASON_START_YEAR = 2024
+SEASON_START_MONTH = 7
+
+ROLL_WIDTH = 9
+DATE_WIDTH = 8
+FILE_ID_WIDTH = 4
+PAGE_WIDTH = 5
+
+
+def page_date(page_text):
+    """Viva date (YYYYMMDD) printed in a page header, or None"""
+    match = PAGE_DATE_PATTERN.search(page_text)
+    if not match:
+        return None
+    day, month, year = (int(part) for part in match.groups())
+    try:
+        return date(year, month, day).strftime('%Y%m%d')
+    except ValueError:
+        return None
+
+
+def file_date(filename, season_start_year=SEASON_START_YEAR):
+    """First viva date encoded in a schedule file name, or None"""
+    match = FILE_DATE_PATTERN.match(os.path.basename(filename))
+    if not match:
+        return None
+    day, month = int(match.group(1)), int(match.group(2))
+    year = season_start_year if month >= SEASON_START_MONTH else season_start_year + 1
+    try:
+        return date(year, month, day).strftime('%Y%m%d')
+    except ValueError:
+        return None
+
+
+def resolve_page_dates(filename, pages, season_start_year=SEASON_START_YEAR):
+    """Fill in pages without a header date from the page before, or the file name.
+
+    `pages` is a list of [page_number, date_or_None, rolls]; returns the same
+    list sorted by page with every date set (None only if nothing is known).
+    """
+    current = file_date(filename, season_start_year)
+    resolved = []
+    for page_number, viva_date, rolls in sorted(pages, key=lambda p: p[0]):
+        current = viva_date or current
+        resolved.append([page_number, current, rolls])
+    return resolved
+
+
+def build_schedule_index(files, prefix=INDEX_PREFIX):
+    """Write the roll and date indexes.
+
+    `files` maps a schedule file name to its resolved pages. A roll listed in
+    several schedules keeps its earliest viva.
+    """
+    file_names = sorted(files)
+    entries = {}
+    for file_id, name in enumerate(file_names):
+        for page_number, viva_date, rolls in files[name]:
+            entry = (viva_date or '0' * DATE_WIDTH, file_id, page_number)
+            for roll in rolls:
+                if roll not in entries or entry < entries[roll]:
+                    entries[roll] = entry
+
+    roll_records = (
+        (roll.encode(), f'{viva_date}{file_id:0{FILE_ID_WIDTH}d}{page:0{PAGE_WIDTH}d}'.encode())
+        for roll, (viva_date, file_id, page) in entries.items()
+    )
+    date_records = (
+        (f'{viva_date}{roll}'.encode(), f'{file_id:0{FILE_ID_WIDTH}d}{page:0{PAGE_WIDTH}d}'.encode())
+        for roll, (viva_date, file_id, page) in entries.items()
+    )
+    write_index(prefix + '.roll', roll_records, ROLL_WIDTH, DATE_WIDTH + FILE_ID_WIDTH + PAGE_WIDTH)
+    write_index(prefix + '.date', date_records, DATE_WIDTH + ROLL_WIDTH, FILE_ID_WIDTH + PAGE_WIDTH)
+    with open(prefix + '.json', 'w') as f:
+        json.dump(file_names, f)
+    return len(entries)
+
+
+def _iso(viva_date):
+    if viva_date == '0' * DATE_WIDTH:
+        return None
+    return f'{viva_date[:4]}-{viva_date[4:6]}-{viva_date[6:]}'
+
+
+def _compact(iso_date):
+    return iso_date.replace('-', '')
+
+
+class ScheduleIndex:
+    def __init__(self, prefix=INDEX_PREFIX):
+        with open(prefix + '.json') as f:
+            self.files = json.load(f)
+        self.by_roll = SortedIndex(prefix + '.roll')
+        self.by_date = SortedIndex(prefix + '.date')
+
+    def close(self):
+        self.by_roll.close()
+        self.by_date.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.by_roll)
+
+    def lookup(self, roll):
+        value = self.by_roll.get(roll.encode())
+        if value is None:
+            return None
+        value = value.decode()
+        file_id = int(value[DATE_WIDTH:DATE_WIDTH + FILE_ID_WIDTH])
+        return {
+            'roll': roll,
+            'viva_date': _iso(value[:DATE_WIDTH]),
+            'file': self.files[file_id],
+            'page': int(value[DATE_WIDTH + FILE_ID_WIDTH:]),
+        }
+
+    def rolls_between(self, start=None, end=None):
+        """Yield (viva_date, roll) with start <= viva_date <= end (ISO dates), in date order"""
+        lo = _compact(start).encode() if start else None
+        hi = str(int(_compact(end)) + 1).encode() if end else None
+        for key, _ in self.by_date.range(lo, hi):
+            key = key.decode()
+            yield _iso(key[:DATE_WIDTH]), key[DATE_WIDTH:]
+
+    def rolls_by_viva_date(self):
+        """Every indexed roll, earliest viva first"""
+        return [roll for _, roll in self.rolls_between()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up rolls in the viva schedule index.")
+    parser.add_argument("roll", nargs="?", help="Roll number to look up")
+    parser.add_argument("--from", dest="start", help="First viva date of a range scan (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", help="Last viva date of a range scan (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    with ScheduleIndex() as index:
+        if args.roll:
+            entry = index.lookup(args.roll)
+            if entry is None:
+                print(f"No schedule entry for roll number: {args.roll}")
+            else:
+                print(f"Roll: {entry['roll']} | Viva Date: {entry['viva_date']} | File: {entry['file']} | Page: {entry['page']}")
+        elif args.start or args.end:
+            count = 0
+            for viva_date, roll in index.rolls_between(args.start, args.end):
+                print(f"{viva_date} {roll}")
+                count += 1
+            print(f"{count} rolls")
+        else:
+            parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
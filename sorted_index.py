@@ -0,0 +1,99 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Sorted, fixed-width on-disk index. Records are key + value byte
+# strings of constant width stored in key order after a small header, so a
+# memory-mapped file can be binary searched in O(log n) without loading it.
+# ------------------------------------------------------------------------------
+
+import mmap
+import os
+import struct
+
+MAGIC = b'NTIX'
+# magic, key width, value width, record count, size of the source it was built from
+HEADER = struct.Struct('<4sHHQQ')
+
+
+def write_index(path, records, key_width, value_width, source_size=0):
+    """Write (key, value) byte pairs as a sorted index; later duplicates win"""
+    latest = {}
+    for key, value in records:
+        if len(key) != key_width or len(value) != value_width:
+            raise ValueError(f"Index record {key!r} does not match widths {key_width}/{value_width}")
+        latest[key] = value
+
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, key_width, value_width, len(latest), source_size))
+        for key in sorted(latest):
+            f.write(key)
+            f.write(latest[key])
+    os.replace(temp_path, path)
+    return len(latest)
+
+
+class SortedIndex:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        header = self.file.read(HEADER.size)
+        if len(header) != HEADER.size:
+            raise ValueError(f"{path} is not a sorted index")
+        magic, self.key_width, self.value_width, self.count, self.source_size = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a sorted index")
+        self.record_width = self.key_width + self.value_width
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def key_at(self, i):
+        offset = HEADER.size + i * self.record_width
+        return self.data[offset:offset + self.key_width]
+
+    def record_at(self, i):
+        offset = HEADER.size + i * self.record_width
+        record = self.data[offset:offset + self.record_width]
+        return record[:self.key_width], record[self.key_width:]
+
+    def bisect_left(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def get(self, key):
+        i = self.bisect_left(key)
+        if i < self.count and self.key_at(i) == key:
+            return self.record_at(i)[1]
+        return None
+
+    def range(self, lo=None, hi=None):
+        """Yield (key, value) for lo <= key < hi; bounds may be key prefixes"""
+        i = self.bisect_left(lo) if lo is not None else 0
+        while i < self.count:
+            key, value = self.record_at(i)
+            if hi is not None and key >= hi:
+                break
+            yield key, value
+            i += 1
+
+    def items(self):
+        return self.range()
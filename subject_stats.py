@@ -0,0 +1,163 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Single-pass subject statistics. SubjectStats consumes result
+# records one at a time and keeps only per-subject-code counters, so memory
+# stays flat however many candidates are streamed through it. finalize()
+# returns the same statistics, in the same order, as
+# analyze_result.process_data. The counters are also persisted by the result
+# store as a materialized aggregate that analyze_result.py can read directly.
+# ------------------------------------------------------------------------------
+
+import json
+import os
+from collections import defaultdict
+
+STATS_FILE = "subject_stats.json"
+STATS_VERSION = 1
+
+UNKNOWN_POSITION = "UNKNOWN POSITION"
+UNKNOWN_SUBJECT = "UNKNOWN SUBJECT"
+
+# Passed candidates with both position and subject are counted under their own
+# position. The others depend on the code's mapped position, which may only be
+# seen later in the stream, so they are parked under a deferred key and
+# resolved in finalize().
+KNOWN = "known"
+DEFERRED = "deferred"
+
+
+class SubjectStats:
+    def __init__(self):
+        self.total_candidates = 0
+        self.subject_code_map = {}
+        self.position_counts = {}
+        self.failed_counts = defaultdict(int)
+        self.total_counts = defaultdict(int)
+        self.overall_passed = 0
+        self.overall_failed = 0
+
+    def add(self, candidate):
+        self.total_candidates += 1
+        roll = candidate.get("roll", "")
+        status = (candidate.get("status") or "").upper()
+        position = candidate.get("position")
+        subject = candidate.get("subject")
+
+        if len(roll) < 3:
+            return
+        code = roll[:3]
+
+        if status == "PASSED" and position and subject and code not in self.subject_code_map:
+            self.subject_code_map[code] = (position, subject)
+
+        self.total_counts[code] += 1
+        if status == "PASSED":
+            key = (KNOWN, position) if position and subject else (DEFERRED, position or None)
+            counts = self.position_counts.setdefault(code, {})
+            counts[key] = counts.get(key, 0) + 1
+            self.overall_passed += 1
+        elif status == "FAILED":
+            self.failed_counts[code] += 1
+            self.overall_failed += 1
+
+    def update(self, candidates):
+        for candidate in candidates:
+            self.add(candidate)
+        return self
+
+    def to_dict(self):
+        return {
+            "version": STATS_VERSION,
+            "total_candidates": self.total_candidates,
+            "subject_code_map": self.subject_code_map,
+            "position_counts": {
+                code: [[kind, position, count] for (kind, position), count in counts.items()]
+                for code, counts in self.position_counts.items()
+            },
+            "failed_counts": self.failed_counts,
+            "total_counts": self.total_counts,
+            "overall_passed": self.overall_passed,
+            "overall_failed": self.overall_failed,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        if state.get("version") != STATS_VERSION:
+            raise ValueError(f"Unsupported subject stats version: {state.get('version')}")
+        stats = cls()
+        stats.total_candidates = state["total_candidates"]
+        stats.subject_code_map = {code: tuple(pair) for code, pair in state["subject_code_map"].items()}
+        stats.position_counts = {
+            code: {(kind, position): count for kind, position, count in counts}
+            for code, counts in state["position_counts"].items()
+        }
+        stats.failed_counts = defaultdict(int, state["failed_counts"])
+        stats.total_counts = defaultdict(int, state["total_counts"])
+        stats.overall_passed = state["overall_passed"]
+        stats.overall_failed = state["overall_failed"]
+        return stats
+
+    def save(self, filename=STATS_FILE, **extra):
+        """Atomically write the counters; `extra` keys are stored alongside"""
+        state = self.to_dict()
+        state.update(extra)
+        temp_filename = filename + ".tmp"
+        with open(temp_filename, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(temp_filename, filename)
+
+    def resolve_position(self, code, key):
+        kind, position = key
+        if kind == KNOWN:
+            return position
+        if code in self.subject_code_map:
+            return self.subject_code_map[code][0]
+        return position or UNKNOWN_POSITION
+
+    def finalize(self):
+        passed_counts = defaultdict(lambda: defaultdict(int))
+        for code, counts in self.position_counts.items():
+            for key, count in counts.items():
+                passed_counts[code][self.resolve_position(code, key)] += count
+
+        return {
+            "total_candidates": self.total_candidates,
+            "subject_code_map": dict(self.subject_code_map),
+            "passed_counts": passed_counts,
+            "failed_counts": defaultdict(int, self.failed_counts),
+            "total_counts": defaultdict(int, self.total_counts),
+            "overall_passed": self.overall_passed,
+            "overall_failed": self.overall_failed
+        }
+
+
+def read_stats_file(filename=STATS_FILE):
+    """Raw saved aggregate, or None when missing or unreadable"""
+    if not os.path.exists(filename):
+        return None
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"⚠️ Error reading {filename}: {e}")
+        return None
+
+
+def load_fresh_stats(results_file="all_results.json", filename=STATS_FILE):
+    """Finalized statistics from the saved aggregate, or None if it is missing or stale.
+
+    The aggregate is stale when the store flagged it (a roll was re-written) or
+    when the results file was written after it, e.g. by a re-parse.
+    """
+    state = read_stats_file(filename)
+    if state is None or state.get("stale"):
+        return None
+    if os.path.exists(results_file) and os.path.getmtime(results_file) > os.path.getmtime(filename):
+        return None
+    try:
+        return SubjectStats.from_dict(state).finalize()
+    except (KeyError, ValueError, TypeError) as e:
+        print(f"⚠️ Ignoring {filename}: {e}")
+        return None
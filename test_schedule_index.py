@@ -0,0 +1,43 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Tests for the viva date parsing of schedule_index.py, using page
+# text as PyPDF2 extracts it from the bundled schedules.
+#
+# Usage: python -m pytest test_schedule_index.py
+# ------------------------------------------------------------------------------
+
+from schedule_index import page_date, file_date, resolve_page_dates
+
+# Start of page 6 of schedules/14_11_to_04_12.pdf; the date runs into the heading
+REAL_HEADER = (
+    "17.11.2024NON-GOVERNMENT TEACHERS' REGISTRATION AND CERTIFICATION AUTHORITY (NTRCA)\n"
+    "VIVA-VOCE SCHEDULE SHEET OF 18    NTRCA VIVA-VOCEth\n"
+    "Viva Date: \n"
+    "270 Bengali 04B : Group: 11:30 Time: Total:   30 301\n"
+    "301044292 301044300 301044347 301044364 301044365"
+)
+
+
+def test_page_date_reads_real_header():
+    assert page_date(REAL_HEADER) == '20241117'
+
+
+def test_page_date_formats():
+    assert page_date("Viva Date: 31/05/2025") == '20250531'
+    assert page_date("1.6.2025 Group: 11") == '20250601'
+
+
+def test_page_date_rejects_longer_numbers():
+    assert page_date("Total: 117.11.2024") is None
+    assert page_date("17.11.20245") is None
+    assert page_date("30.02.2025") is None
+    assert page_date("no date here") is None
+
+
+def test_header_dates_win_over_file_name():
+    pages = [[2, None, ['301044400']], [1, page_date(REAL_HEADER), ['301044292']]]
+    resolved = resolve_page_dates('14_11_to_04_12.pdf', pages)
+    assert file_date('14_11_to_04_12.pdf') == '20241114'
+    assert resolved == [[1, '20241117', ['301044292']], [2, '20241117', ['301044400']]]
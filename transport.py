@@ -0,0 +1,164 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: HTTP transport shared by the scrapers. Building a
+# fake_useragent.UserAgent loads its browser database (tens of milliseconds),
+# so a pool of user agents is drawn once and handed out in rotation, each
+# with a prebuilt headers dict. Every thread gets its own requests.Session
+# whose HTTPAdapter keeps connections to each proxy alive, instead of a new
+# connection per roll through the module-level requests.post. Proxy connections
+# get TCP_NODELAY like direct ones: urllib3 writes the headers and the body
+# separately, and on a kept-alive connection Nagle would hold the body back
+# until the proxy's delayed ACK (~40ms) arrives. An optional on_connect
+# callback is told how long each new connection took to set up, so the
+# threaded scrapers report connect time like aiohttp's trace hooks do.
+# ------------------------------------------------------------------------------
+
+import itertools
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from fake_useragent import UserAgent
+
+from proxy_pool import ProxyPool
+
+RESULT_URL = 'http://ntrca.teletalk.com.bd/result/index.php'
+
+BASE_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Cache-Control': 'max-age=0',
+    'Connection': 'keep-alive',
+    'Content-Type': 'application/x-www-form-urlencoded',
+    'Origin': 'http://ntrca.teletalk.com.bd',
+    'Referer': RESULT_URL,
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# Used when the fake_useragent database cannot be loaded
+FALLBACK_USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:125.0) Gecko/20100101 Firefox/125.0',
+]
+
+
+def load_user_agents(count=32):
+    """Up to `count` distinct user agents, drawn from one UserAgent instance"""
+    try:
+        user_agent = UserAgent()
+        agents = list(dict.fromkeys(user_agent.random for _ in range(count)))
+    except Exception as e:
+        print(f"⚠️ Could not load user agents, using built-in ones: {e}")
+        agents = []
+    return agents or list(FALLBACK_USER_AGENTS)
+
+
+def timed_pool_classes(on_connect):
+    """urllib3 pool classes whose connections report their setup time to `on_connect(seconds)`"""
+
+    def timed_connect(connection_class):
+        class TimedConnection(connection_class):
+            def connect(self):
+                start = time.monotonic()
+                super().connect()
+                on_connect(time.monotonic() - start)
+        return TimedConnection
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = timed_connect(HTTPConnection)
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = timed_connect(HTTPSConnection)
+
+    return {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+
+class ProxyAdapter(HTTPAdapter):
+    """HTTPAdapter whose proxy connections use urllib3's default socket options,
+    optionally timing every new connection"""
+
+    def __init__(self, *args, on_connect=None, **kwargs):
+        # Set before HTTPAdapter.__init__, which already builds the pool manager
+        self.pool_classes = timed_pool_classes(on_connect) if on_connect else None
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        if self.pool_classes:
+            self.poolmanager.pool_classes_by_scheme = self.pool_classes
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        # requests builds proxy managers without them, leaving Nagle on
+        proxy_kwargs.setdefault('socket_options', HTTPConnection.default_socket_options)
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if self.pool_classes:
+            manager.pool_classes_by_scheme = self.pool_classes
+        return manager
+
+
+class Transport:
+    """Per-thread sessions and rotating header templates for result page POSTs.
+
+    `pool_connections` is how many proxies' connection pools a session keeps
+    and `pool_maxsize` the connections kept alive in each. A session is only
+    used by its own thread, one request at a time, so a small pool suffices.
+    `on_connect(seconds)`, if given, is called for every new connection.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=2, user_agents=None, timeout=15, on_connect=None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.on_connect = on_connect
+        self.header_templates = [
+            dict(BASE_HEADERS, **{'User-Agent': agent})
+            for agent in (user_agents or load_user_agents())
+        ]
+        # next() on itertools.count is atomic, so rotation needs no lock
+        self.counter = itertools.count()
+        self.local = threading.local()
+        self.sessions = []
+        self.lock = threading.Lock()
+
+    def headers(self):
+        """The next prebuilt headers dict; callers must not modify it"""
+        return self.header_templates[next(self.counter) % len(self.header_templates)]
+
+    def session(self):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = ProxyAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, on_connect=self.on_connect)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.verify = False
+            # Proxies are always passed explicitly; skips the per-request
+            # environment proxy and .netrc lookups
+            session.trust_env = False
+            self.local.session = session
+            with self.lock:
+                self.sessions.append(session)
+        return session
+
+    def post(self, data, proxy, timeout=None):
+        """POST an encoded form to the result page through `proxy` on this thread's session"""
+        return self.session().post(
+            RESULT_URL,
+            headers=self.headers(),
+            data=data,
+            proxies=ProxyPool.as_requests(proxy),
+            timeout=timeout or self.timeout,
+        )
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions:
+                session.close()
+            self.sessions = []
+        self.local = threading.local()
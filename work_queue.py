@@ -0,0 +1,286 @@
+# ------------------------------------------------------------------------------
+# Copyright (c) 2025 Mahfujar Rahman
+# Author: Mahfujar Rahman Noyon <mrnoyon.cse@gmail.com>
+# Created: 2025-06-05
+# Description: Lease-based work queue for scraping from several processes or
+# hosts that share a filesystem. Rolls are split into ranges stored in a SQLite
+# file; workers (get_result_multi.py --queue) claim a range for a limited time,
+# renew the lease while they work on it and mark it done at the end. A range
+# whose lease ran out, e.g. because its worker crashed, is handed out again.
+# Each worker saves into its own shard store under <exam dir>/shards/<worker>,
+# and the merge command folds the shards into the exam's canonical store and
+# their raw page archives into the exam's archive.
+#
+# The database uses SQLite's default rollback journal, since WAL mode does not
+# work on network filesystems.
+#
+# Usage: python work_queue.py seed [--manifest exams.json] [--range-size 500]
+#        python work_queue.py status
+#        python work_queue.py merge [--manifest exams.json] [--remove-shards]
+# ------------------------------------------------------------------------------
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+
+from exams import Exam, DEFAULT_EXAM, load_manifest
+from raw_archive import ARCHIVE_DIR, INDEX_FILE
+from result_store import RESULTS_STORE, FINAL_STATUSES, ResultStore
+
+QUEUE_FILE = "work_queue.db"
+SHARDS_DIR = "shards"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ranges (
+    id INTEGER PRIMARY KEY,
+    exam TEXT NOT NULL,
+    first_roll TEXT NOT NULL,
+    last_roll TEXT NOT NULL,
+    rolls TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_until REAL,
+    claims INTEGER NOT NULL DEFAULT 0,
+    done_at REAL
+);
+CREATE INDEX IF NOT EXISTS ranges_state ON ranges (state, lease_until);
+"""
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def shard_exam(exam, worker_id):
+    """The exam as seen by one worker: same form and rolls, its own shard directory"""
+    return Exam(exam.exam_id, exam.name, exam.rolls_file, os.path.join(exam.directory, SHARDS_DIR, worker_id))
+
+
+def canonical_rolls(exam):
+    """Rolls with a final result in the exam's canonical store"""
+    store = ResultStore(exam.path(RESULTS_STORE), legacy_json=None)
+    return {roll for roll, status in store.iter_keys() if status in FINAL_STATUSES}
+
+
+class Lease:
+    def __init__(self, range_id, exam, rolls, owner, lease_until):
+        self.range_id = range_id
+        self.exam = exam
+        self.rolls = rolls
+        self.owner = owner
+        self.lease_until = lease_until
+
+    def __repr__(self):
+        return f"Lease({self.range_id}, {self.exam!r}, {len(self.rolls)} rolls)"
+
+
+class WorkQueue:
+    def __init__(self, path=QUEUE_FILE, lease_seconds=300):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        # Autocommit; claims take the write lock explicitly with BEGIN IMMEDIATE
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def seed(self, exam_name, rolls, range_size=500, reseed=False):
+        """Split `rolls` into ranges for one exam; returns the number of ranges added"""
+        rolls = sorted(rolls)
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                if reseed:
+                    self.db.execute("DELETE FROM ranges WHERE exam = ?", (exam_name,))
+                elif self.db.execute("SELECT 1 FROM ranges WHERE exam = ? LIMIT 1", (exam_name,)).fetchone():
+                    raise Exception(f"Exam {exam_name} is already seeded (use --reseed)")
+                count = 0
+                for start in range(0, len(rolls), range_size):
+                    chunk = rolls[start:start + range_size]
+                    self.db.execute(
+                        "INSERT INTO ranges (exam, first_roll, last_roll, rolls, size) VALUES (?, ?, ?, ?, ?)",
+                        (exam_name, chunk[0], chunk[-1], json.dumps(chunk), len(chunk))
+                    )
+                    count += 1
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return count
+
+    def claim(self, worker_id):
+        """Lease the next pending or expired range, or None when nothing is claimable"""
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.db.execute(
+                    "SELECT id, exam, rolls FROM ranges"
+                    " WHERE state = 'pending' OR (state = 'leased' AND lease_until < ?)"
+                    " ORDER BY id LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    self.db.execute("COMMIT")
+                    return None
+                lease_until = now + self.lease_seconds
+                self.db.execute(
+                    "UPDATE ranges SET state = 'leased', owner = ?, lease_until = ?, claims = claims + 1 WHERE id = ?",
+                    (worker_id, lease_until, row[0])
+                )
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return Lease(row[0], row[1], json.loads(row[2]), worker_id, lease_until)
+
+    def _update_owned(self, lease, sql, params):
+        with self.lock:
+            cursor = self.db.execute(
+                sql + " WHERE id = ? AND owner = ? AND state = 'leased'",
+                params + (lease.range_id, lease.owner)
+            )
+            return cursor.rowcount == 1
+
+    def renew(self, lease):
+        """Extend a lease; False if it expired and was claimed by another worker"""
+        lease_until = time.time() + self.lease_seconds
+        if not self._update_owned(lease, "UPDATE ranges SET lease_until = ?", (lease_until,)):
+            return False
+        lease.lease_until = lease_until
+        return True
+
+    def complete(self, lease):
+        return self._update_owned(lease, "UPDATE ranges SET state = 'done', done_at = ?", (time.time(),))
+
+    def release(self, lease):
+        """Give a range back unfinished so another worker can pick it up at once"""
+        return self._update_owned(lease, "UPDATE ranges SET state = 'pending', owner = NULL, lease_until = NULL", ())
+
+    def remaining(self):
+        """Number of rolls in ranges that are not done"""
+        with self.lock:
+            return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM ranges WHERE state != 'done'").fetchone()[0]
+
+    def status(self):
+        """{exam: {state: (ranges, expired_leases)}}"""
+        now = time.time()
+        summary = {}
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT exam, state, COUNT(*), SUM(CASE WHEN state = 'leased' AND lease_until < ? THEN 1 ELSE 0 END)"
+                " FROM ranges GROUP BY exam, state",
+                (now,)
+            ).fetchall()
+        for exam, state, count, expired in rows:
+            summary.setdefault(exam, {})[state] = (count, expired)
+        return summary
+
+
+class LeaseKeeper:
+    """Background thread renewing a lease every third of its length while work is in progress"""
+
+    def __init__(self, work_queue, lease):
+        self.work_queue = work_queue
+        self.lease = lease
+        self.lost = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.work_queue.lease_seconds / 3):
+            if not self.work_queue.renew(self.lease):
+                self.lost = True
+                print(f"⚠️ Lost the lease on range {self.lease.range_id}; another worker may redo it")
+                return
+
+
+def merge_shards(exam, remove_shards=False):
+    """Append every final shard result missing from the canonical store and copy
+    the shards' archived pages into the exam's archive.
+
+    Returns (results added, archived rolls copied, shards). Shards are only
+    removed once both have been merged, so --archive pages survive too.
+    """
+    shard_stores = sorted(glob.glob(os.path.join(exam.directory, SHARDS_DIR, '*', RESULTS_STORE)))
+    shard_archives = [
+        os.path.join(os.path.dirname(path), ARCHIVE_DIR) for path in shard_stores
+        if os.path.exists(os.path.join(os.path.dirname(path), ARCHIVE_DIR, INDEX_FILE))
+    ]
+    added = archived = 0
+    exam.open(archive=bool(shard_archives))
+    try:
+        for path in shard_stores:
+            shard = ResultStore(path, legacy_json=None)
+            for result in shard.latest_records():
+                if result.get('status') in FINAL_STATUSES and result['roll'] not in exam.store.rolls:
+                    exam.store.append(result)
+                    added += 1
+        for directory in shard_archives:
+            archived += exam.archive.import_archive(directory)
+    finally:
+        exam.close()
+    exam.export_json()
+    if remove_shards:
+        for path in shard_stores:
+            shutil.rmtree(os.path.dirname(path))
+    return added, archived, len(shard_stores)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coordinate scraping across several workers with leased roll ranges.")
+    parser.add_argument("command", choices=["seed", "status", "merge"], help="seed: split rolls into ranges, status: show progress, merge: fold shard stores into the canonical ones")
+    parser.add_argument("--db", default=QUEUE_FILE, help=f"Queue database on the shared filesystem (default: {QUEUE_FILE})")
+    parser.add_argument("--manifest", help="Exam manifest, as for get_result_multi.py")
+    parser.add_argument("--exam", default=DEFAULT_EXAM, help=f"Exam id when no manifest is given (default: {DEFAULT_EXAM})")
+    parser.add_argument("--range-size", type=int, default=500, help="Rolls per leased range (default: 500)")
+    parser.add_argument("--reseed", action="store_true", help="Replace the ranges of exams that were seeded before")
+    parser.add_argument("--remove-shards", action="store_true", help="Delete the shard directories after merging their results and archives")
+    args = parser.parse_args()
+
+    exams = load_manifest(args.manifest) if args.manifest else [Exam(args.exam)]
+
+    if args.command == "merge":
+        for exam in exams:
+            added, archived, shards = merge_shards(exam, args.remove_shards)
+            print(f"🧹 {exam.name}: merged {added} new results from {shards} shards into {exam.path(RESULTS_STORE)}")
+            if archived:
+                print(f"📦 {exam.name}: copied {archived} archived pages into {exam.path(ARCHIVE_DIR)}")
+        return
+
+    work_queue = WorkQueue(args.db)
+    try:
+        if args.command == "seed":
+            for exam in exams:
+                rolls = set(exam.load_rolls()) - canonical_rolls(exam)
+                ranges = work_queue.seed(exam.name, rolls, args.range_size, args.reseed)
+                print(f"📋 {exam.name}: {len(rolls)} rolls in {ranges} ranges")
+        else:
+            for exam, states in sorted(work_queue.status().items()):
+                line = ", ".join(f"{state}: {count}" for state, (count, _) in sorted(states.items()))
+                expired = states.get('leased', (0, 0))[1]
+                print(f"📋 {exam}: {line}" + (f" ({expired} leases expired)" if expired else ""))
+            print(f"Remaining rolls: {work_queue.remaining()}")
+    finally:
+        work_queue.close()
+
+
+if __name__ == "__main__":
+    main()